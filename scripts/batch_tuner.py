@@ -0,0 +1,251 @@
+import json
+import logging
+import os
+import platform
+import threading
+import time
+import cv2
+import numpy as np
+import psutil
+import torch
+from frame_ids import FileLock, atomic_write_text
+from inference_backend import weights_hash
+
+CANDIDATES = (1, 2, 4, 8, 16, 32, 64)
+PROBE_ROUNDS = 3          # Timed calls per candidate, after one warm-up call
+GPU_MEMORY_FRACTION = 0.85  # Ceiling on peak CUDA memory, as a share of the device
+RAM_FRACTION = 0.5        # Ceiling on RSS growth, as a share of RAM available when probing
+MIN_SPEEDUP = 1.05        # Stop probing once a bigger batch is less than 5% faster
+SLOWDOWN_RATIO = 0.6      # Try a smaller batch when throughput drops below 60% of normal
+WINDOW_FRAMES = 256       # Frames per throughput measurement at runtime
+
+
+def machine_key():
+    """Identify the hardware a tuned batch size is valid for."""
+    if torch.cuda.is_available():
+        device = torch.cuda.get_device_name(0).replace(" ", "_")
+    else:
+        device = "cpu"
+    ram_gb = round(psutil.virtual_memory().total / 1024**3)
+    return f"{platform.node()}-{platform.machine()}-{os.cpu_count()}cpu-{ram_gb}gb-{device}"
+
+
+def cache_key(backend, weights, frame_shape):
+    """Cache key for a tuned batch size: machine, backend, weights hash and frame size."""
+    h, w = frame_shape[:2]
+    return f"{machine_key()}/{backend}/{weights_hash(weights)}/{w}x{h}"
+
+
+def is_out_of_memory(error):
+    if isinstance(error, MemoryError):
+        return True
+    message = str(error).lower()
+    return "out of memory" in message or "failed to allocate memory" in message
+
+
+class PeakRss:
+    """Samples the process RSS on a thread to catch the peak during a call."""
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._process = psutil.Process()
+        self.peak = 0
+
+    def __enter__(self):
+        self.peak = self._process.memory_info().rss
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, self._process.memory_info().rss)
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._process.memory_info().rss)
+
+
+class BatchTuner:
+    """Picks and maintains the batch size for ``predict_fn(frames)``.
+
+    tune() probes batch sizes in ``CANDIDATES`` order on sample frames,
+    recording frames/sec and peak memory, and keeps the fastest size whose
+    peak stays under the memory ceiling. The result is cached in
+    ``cache_file`` under ``cache_key`` (machine, model hash and frame size),
+    so later runs skip the probe.
+
+    predict() runs frames through ``predict_fn`` in chunks of the current
+    batch size. An out-of-memory error drops to the next smaller candidate,
+    retries and updates the cache. If throughput falls well below its normal level a smaller
+    size is tried for one window, and kept only if it turns out faster. Throughput is measured
+    on full batches called without ``kwargs`` only, so partial batches and calls at another
+    input size (e.g. a cascade's low-res triage) don't read as slowdowns.
+
+    Passing ``batch_size`` pins the size: no probe and no slowdown
+    adjustments, though OOM still shrinks it.
+    """
+    def __init__(self, predict_fn, batch_size=None, cache_file=None, cache_key=None):
+        self.predict_fn = predict_fn
+        self.pinned = batch_size is not None
+        self.batch_size = batch_size or CANDIDATES[0]
+        self.cache_file = cache_file
+        self.cache_key = cache_key
+        self._baseline_fps = None
+        self._trial = None  # (previous size, its fps) while trying a smaller size
+        self._window_frames = 0
+        self._window_seconds = 0.0
+
+    # --- Cache ---
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entry):
+        if not self.cache_file or not self.cache_key:
+            return
+        with FileLock(self.cache_file):
+            cache = self._load_cache()
+            cache[self.cache_key] = dict(cache.get(self.cache_key, {}), **entry, updated_at=time.time())
+            atomic_write_text(self.cache_file, json.dumps(cache, indent=2))
+
+    # --- Probing ---
+    def _measure(self, frames):
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+            torch.cuda.reset_peak_memory_stats()
+        self.predict_fn(frames)  # Warm-up: allocator growth, cudnn autotune
+        with PeakRss() as rss:
+            start = time.perf_counter()
+            for _ in range(PROBE_ROUNDS):
+                self.predict_fn(frames)
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            elapsed = time.perf_counter() - start
+        gpu_peak = torch.cuda.max_memory_allocated() if torch.cuda.is_available() else 0
+        return PROBE_ROUNDS * len(frames) / elapsed, rss.peak, gpu_peak
+
+    def probe(self, sample_frames):
+        """Time each candidate size and return the per-size measurements."""
+        rss_limit = psutil.Process().memory_info().rss + RAM_FRACTION * psutil.virtual_memory().available
+        gpu_limit = None
+        if torch.cuda.is_available():
+            gpu_limit = GPU_MEMORY_FRACTION * torch.cuda.get_device_properties(0).total_memory
+        rows, best_fps = [], 0.0
+        for size in CANDIDATES:
+            frames = [sample_frames[i % len(sample_frames)] for i in range(size)]
+            try:
+                fps, rss_peak, gpu_peak = self._measure(frames)
+            except Exception as e:
+                if not is_out_of_memory(e):
+                    raise
+                rows.append({"batch_size": size, "oom": True})
+                break
+            fits = rss_peak <= rss_limit and (gpu_limit is None or gpu_peak <= gpu_limit)
+            rows.append({"batch_size": size, "fps": fps, "rss_peak": rss_peak,
+                         "gpu_peak": gpu_peak, "fits": fits})
+            print(f"🧪 Batch {size}: {fps:.1f} frames/s, peak RSS {rss_peak / 1024**2:.0f} MB"
+                  + (f", peak GPU {gpu_peak / 1024**2:.0f} MB" if gpu_limit else ""))
+            if not fits or fps < best_fps * MIN_SPEEDUP:
+                break
+            best_fps = fps
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return rows
+
+    def tune(self, sample_frames):
+        """Load the cached batch size for this machine and model, probing if there is none."""
+        if self.pinned:
+            return self.batch_size
+        cached = self._load_cache().get(self.cache_key) if self.cache_file else None
+        if cached and cached.get("batch_size"):
+            self.batch_size = cached["batch_size"]
+            return self.batch_size
+        print("📏 Probing inference batch sizes (cached after this run)...")
+        rows = self.probe(sample_frames)
+        fitting = [row for row in rows if row.get("fits")]
+        if fitting:
+            best = max(fitting, key=lambda row: row["fps"])
+            self.batch_size = best["batch_size"]
+        print(f"📏 Using batch size {self.batch_size}.")
+        self._save({"batch_size": self.batch_size, "probe": rows})
+        return self.batch_size
+
+    # --- Runtime ---
+    def _smaller(self):
+        smaller = [size for size in CANDIDATES if size < self.batch_size]
+        return smaller[-1] if smaller else None
+
+    def _shrink_after_oom(self):
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        smaller = self._smaller()
+        if smaller is None:
+            return False
+        print(f"⚠️ Out of memory at batch size {self.batch_size}; dropping to {smaller}.")
+        logging.error(f"Out of memory at batch size {self.batch_size}; dropping to {smaller}")
+        self.batch_size = smaller
+        self._baseline_fps = self._trial = None
+        self._window_frames, self._window_seconds = 0, 0.0
+        if not self.pinned:
+            self._save({"batch_size": smaller})
+        return True
+
+    def _observe(self, frames, seconds):
+        if self.pinned:
+            return
+        self._window_frames += frames
+        self._window_seconds += seconds
+        if self._window_frames < WINDOW_FRAMES:
+            return
+        fps = self._window_frames / max(self._window_seconds, 1e-9)
+        self._window_frames, self._window_seconds = 0, 0.0
+
+        if self._trial is not None:
+            previous_size, previous_fps = self._trial
+            self._trial = None
+            if fps <= previous_fps:
+                # A smaller batch didn't help, so the slowdown isn't the batch size
+                self.batch_size = previous_size
+            self._baseline_fps = max(fps, previous_fps)
+            return
+        if self._baseline_fps is None:
+            self._baseline_fps = fps
+        elif fps < SLOWDOWN_RATIO * self._baseline_fps and self._smaller() is not None:
+            print(f"🐢 Inference slowed to {fps:.1f} frames/s; trying batch size {self._smaller()}.")
+            self._trial = (self.batch_size, fps)
+            self.batch_size = self._smaller()
+        else:
+            self._baseline_fps = max(self._baseline_fps, fps)
+
+    def predict(self, frames, **kwargs):
+        """Run ``predict_fn(frames, **kwargs)`` in batches, adapting to OOM and slowdowns."""
+        results = []
+        i = 0
+        while i < len(frames):
+            chunk = frames[i:i + self.batch_size]
+            start = time.perf_counter()
+            try:
+                results.extend(self.predict_fn(chunk, **kwargs))
+            except Exception as e:
+                if is_out_of_memory(e) and self._shrink_after_oom():
+                    continue
+                raise
+            # Only full batches at the model's own input size say anything about the tuned size
+            if len(chunk) == self.batch_size and not kwargs:
+                self._observe(len(chunk), time.perf_counter() - start)
+            i += len(chunk)
+        return results
+
+
+def sample_frames(image_paths=(), shape=(720, 1280, 3), count=8):
+    """Frames to probe with: real images when available, else noise of ``shape``."""
+    frames = [img for img in (cv2.imread(str(p)) for p in list(image_paths)[:count]) if img is not None]
+    if frames:
+        return frames
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, shape, dtype=np.uint8) for _ in range(count)]
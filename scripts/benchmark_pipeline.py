@@ -0,0 +1,246 @@
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+from batch_tuner import BatchTuner, PeakRss, machine_key
+from cascade import CascadePredictor
+from frame_dedup import HashIndex
+from frame_ids import FrameIdAllocator
+from frame_store import FrameManifest
+from inference_backend import BACKENDS, FrameDetections, load_model, predict_detections
+from metrics import StageMetrics, stage_delta
+from storage_budget import StorageBudget
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = REPO_ROOT / "logs" / "eval_reports" / "benchmarks"
+VIDEO_CACHE_DIR = REPO_ROOT / "temp" / "bench_videos"
+RESOLUTIONS = ((640, 360), (1280, 720))
+LENGTHS = (300, 1800)     # Frames per synthetic video
+FPS = 30
+SCENE_LENGTH = 90         # Frames between hard cuts in the synthetic videos
+
+
+# --- Synthetic videos ---
+def make_video(path, width, height, frames, fps=FPS, seed=0):
+    """Write a synthetic match-like video: cuts between scenes with moving coloured boxes and sensor noise."""
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"OpenCV can't write {path}")
+    noise = rng.integers(0, 12, (8, height, width, 3), dtype=np.uint8)
+    for i in range(frames):
+        if i % SCENE_LENGTH == 0:
+            background = rng.integers(20, 200, 3)
+            boxes = [(rng.integers(0, width), rng.integers(0, height), rng.integers(-6, 7), rng.integers(-4, 5),
+                      tuple(int(c) for c in rng.choice([(0, 0, 220), (220, 0, 0)])))
+                     for _ in range(rng.integers(2, 7))]
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = background
+        t = i % SCENE_LENGTH
+        for x, y, dx, dy, colour in boxes:
+            cx, cy = int(x + dx * t) % width, int(y + dy * t) % height
+            cv2.rectangle(frame, (cx, cy), (cx + width // 10, cy + height // 14), colour, -1)
+        frame += noise[i % len(noise)]
+        writer.write(frame)
+    writer.release()
+
+
+def synthetic_video(width, height, frames):
+    """Path of a cached synthetic video, generating it on first use."""
+    VIDEO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = VIDEO_CACHE_DIR / f"synthetic_{width}x{height}_{frames}.mp4"
+    if not path.exists():
+        print(f"🎬 Generating {path.name}...")
+        tmp_path = path.with_name(path.stem + ".tmp.mp4")
+        make_video(tmp_path, width, height, frames)
+        tmp_path.replace(path)
+    return path
+
+
+# --- Stub detector ---
+class StubDetector:
+    """Stands in for YOLO: a fixed latency per call and per frame, and positives at a set rate.
+
+    Decisions are a deterministic function of the frame's contents, so the
+    same video gives the same positives on every run.
+    """
+    def __init__(self, positive_rate=0.3, latency_ms=15.0, per_frame_ms=5.0):
+        self.positive_rate = positive_rate
+        self.latency = latency_ms / 1000
+        self.per_frame = per_frame_ms / 1000
+
+    def predict_detections(self, frames, imgsz=640, **kwargs):
+        # Per-frame cost scales with the input area, so cascade triage is cheaper here too
+        time.sleep(self.latency + self.per_frame * (imgsz / 640) ** 2 * len(frames))
+        detections = []
+        for frame in frames:
+            h, w = frame.shape[:2]
+            # A cheap, stable pseudo-random draw from a few pixels
+            draw = (int(frame[h // 2, w // 2].sum()) * 2654435761 % 2**32) / 2**32
+            if draw < self.positive_rate:
+                box = np.array([[w * 0.4, h * 0.4, w * 0.6, h * 0.6]], np.float32)
+                detections.append(FrameDetections(
+                    box, np.array([[0.5, 0.5, 0.2, 0.2]], np.float32),
+                    np.array([0.5 + 0.5 * draw / max(self.positive_rate, 1e-9)], np.float32),
+                    np.zeros(1, np.float32), (h, w)))
+            else:
+                detections.append(FrameDetections.empty((h, w)))
+        return detections
+
+
+# --- Benchmark ---
+def _isolate(scraper, workdir, detector, batch_size, cascade=False):
+    """Point the scraper's module state at a scratch directory and the given detector."""
+    raw_dir = workdir / "raw"
+    raw_dir.mkdir(parents=True)
+    scraper.OUTPUT_DIR = raw_dir
+    scraper.PROCESSED_DIR = workdir / "processed"
+    scraper.frame_ids = FrameIdAllocator(workdir / "frame_counter.txt", raw_dir, block_size=scraper.FRAME_ID_BLOCK)
+    scraper.global_hashes = HashIndex()
+    scraper.frame_manifest = FrameManifest(raw_dir)
+    scraper.storage = StorageBudget(raw_dir, workdir / "state.db", budget_bytes=1 << 62,
+                                    manifest=scraper.frame_manifest)
+    scraper.model = detector
+    scraper.batch_tuner = BatchTuner(lambda frames, **kw: predict_detections(detector, frames, **kw),
+                                     batch_size=batch_size)
+    scraper.metrics = StageMetrics()
+    scraper.metrics_reporter = None
+    scraper.label_cache = None
+    scraper.detection_cache = None
+    scraper.cascade = (CascadePredictor(scraper.batch_tuner.predict, scraper.CONFIDENCE_THRESHOLD, scraper.CASCADE_BAND,
+                                        scraper.CASCADE_TRIAGE_IMGSZ, scraper.CASCADE_AUDIT_EVERY) if cascade else None)
+    scraper.stop_requested = False
+
+
+def run_case(scraper, detector, video_path, batch_size, cascade=False):
+    workdir = Path(tempfile.mkdtemp(prefix="bench_"))
+    try:
+        _isolate(scraper, workdir, detector, batch_size, cascade)
+        cap = cv2.VideoCapture(str(video_path))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        before = scraper.metrics.totals()
+        with PeakRss() as rss:
+            start = time.perf_counter()
+            stats = scraper.extract_and_filter_frames(video_path, cap=cap, video_id="benchmark")
+            elapsed = time.perf_counter() - start
+        bytes_written = sum(p.stat().st_size for p in workdir.rglob("frame_*"))
+        scraper.storage.close()
+        return {
+            "seconds": round(elapsed, 3),
+            "video_frames": total_frames,
+            "video_fps": round(total_frames / elapsed, 1),
+            "sampled_fps": round(stats["frames_sampled"] / elapsed, 1),
+            "peak_rss_mb": round(rss.peak / 1024**2, 1),
+            "bytes_written": bytes_written,
+            "stats": stats,
+            "stages": stage_delta(before, scraper.metrics.totals(), elapsed),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print video fps against a previous results file, case by case."""
+    with open(baseline_path, "r") as f:
+        baseline = {case["case"]: case for case in json.load(f)["cases"]}
+    print(f"\n📉 Compared with {Path(baseline_path).name}:")
+    for case in results:
+        old = baseline.get(case["case"])
+        if old:
+            change = case["video_fps"] / old["video_fps"] - 1
+            flag = "⚠️" if change < -0.1 else "  "
+            print(f"{flag} {case['case']}: {old['video_fps']} → {case['video_fps']} frames/s ({change:+.0%})")
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extract_and_filter_frames on synthetic videos, offline.")
+    parser.add_argument("--detector", choices=("stub", "real", "both"), default="stub")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch", help="Backend for the real detector")
+    parser.add_argument("--positive-rate", type=float, default=0.3, help="Stub detector positive rate")
+    parser.add_argument("--latency-ms", type=float, default=15.0, help="Stub detector latency per call")
+    parser.add_argument("--per-frame-ms", type=float, default=5.0, help="Stub detector latency per frame")
+    parser.add_argument("--resolutions", type=lambda s: [parse_size(x) for x in s.split(",")],
+                        default=list(RESOLUTIONS), help="e.g. 640x360,1280x720")
+    parser.add_argument("--lengths", type=lambda s: [int(x) for x in s.split(",")], default=list(LENGTHS),
+                        help="Frames per video, e.g. 300,1800")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest is kept")
+    parser.add_argument("--baseline", type=Path, help="Earlier results JSON to compare against")
+    parser.add_argument("--cascade", action="store_true", help="Run inference as a low-res triage plus full-res cascade")
+    parser.add_argument("--greyscale", action="store_true", help="Capture, infer on and save single-channel frames")
+    parser.add_argument("--format", help="Frame encoding, e.g. png:1, jpeg:95 or webp:90 (default: FRAME_FORMAT); "
+                                         "frame_codec.py compares encoders on their own")
+    args = parser.parse_args()
+
+    import scraper
+    scraper.CAPTURE_GREYSCALE = args.greyscale
+    if args.format:
+        scraper.FRAME_FORMAT = args.format
+
+    detectors = []
+    if args.detector in ("stub", "both"):
+        detectors.append((f"stub(p={args.positive_rate},{args.latency_ms}+{args.per_frame_ms}ms)",
+                          StubDetector(args.positive_rate, args.latency_ms, args.per_frame_ms)))
+    if args.detector in ("real", "both"):
+        if scraper.MODEL_PATH.exists():
+            detectors.append((f"best.pt/{args.backend}", load_model(args.backend, scraper.MODEL_PATH)))
+        else:
+            print(f"⚠️ {scraper.MODEL_PATH} not found; skipping the real detector.")
+
+    cases = []
+    for width, height in args.resolutions:
+        for frames in args.lengths:
+            video = synthetic_video(width, height, frames)
+            for name, detector in detectors:
+                case = (f"{name} {width}x{height} {frames}f" + (" cascade" if args.cascade else "")
+                        + (" grey" if args.greyscale else "") + (f" {args.format}" if args.format else ""))
+                runs = [run_case(scraper, detector, video, args.batch_size, args.cascade)
+                        for _ in range(max(1, args.repeat))]
+                best = max(runs, key=lambda run: run["video_fps"])
+                cases.append({"case": case, "detector": name, "width": width, "height": height,
+                              "frames": frames, **best})
+                print(f"⏱️ {case}: {best['video_fps']} video frames/s, {best['sampled_fps']} sampled/s, "
+                      f"peak RSS {best['peak_rss_mb']} MB, {best['bytes_written'] / 1024**2:.1f} MB written")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "machine": machine_key(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "config": {name: getattr(scraper, name) for name in (
+            "FRAME_SKIP", "SAMPLING_MODE", "DEDUP_ENABLED", "SCENE_GATE_ENABLED", "WRITER_THREADS",
+            "DECODE_QUEUE_SIZE", "PENDING_FRAMES_PER_BATCH", "FRAME_POOL_SIZE", "CAPTURE_GREYSCALE", "FRAME_FORMAT")}
+                  | {"BATCH_SIZE": args.batch_size, "CASCADE": args.cascade},
+        "cases": cases,
+    }
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = BENCH_DIR / f"pipeline_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Saved results to {out_path}")
+    if args.baseline:
+        compare(cases, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
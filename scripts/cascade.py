@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class CascadePredictor:
+    """Two-pass inference: a cheap low-resolution triage, then full resolution where it matters.
+
+    Every frame is first run at ``triage_imgsz``. Frames whose max confidence
+    lands in ``band`` (low inclusive, high exclusive), i.e. close enough to
+    ``threshold`` that the cheap pass can't be trusted, are run again at the
+    model's full size and take that result instead.
+
+    To measure what the shortcut costs, every ``audit_every``-th frame the
+    triage was sure about is also run at full size and the two decisions are
+    compared. Audits don't change the result, so agreement stays an honest
+    estimate of how often triage-only decisions match full-resolution ones.
+    """
+    def __init__(self, predict_fn, threshold, band=(0.25, 0.75), triage_imgsz=320, audit_every=20):
+        low, high = band
+        if not low <= threshold <= high:
+            raise ValueError(f"Cascade band {band} must contain the threshold {threshold}")
+        self.predict_fn = predict_fn
+        self.threshold = threshold
+        self.band = (low, high)
+        self.triage_imgsz = triage_imgsz
+        self.audit_every = audit_every
+        self.frames = 0       # Frames triaged
+        self.refined = 0      # ...re-run at full size because they were uncertain
+        self.audited = 0      # ...re-run at full size only to check the triage decision
+        self.disagreed = 0    # Audited frames whose full-size decision differed
+        self._confident_seen = 0
+
+    def predict(self, frames):
+        """Return (detections, full_res): one FrameDetections per frame and which came from the full-size pass."""
+        detections = list(self.predict_fn(frames, imgsz=self.triage_imgsz))
+        conf = np.array([d.max_conf for d in detections], dtype=np.float32)
+        uncertain = (conf >= self.band[0]) & (conf < self.band[1])
+        audit = np.zeros(len(frames), bool)
+        if self.audit_every:
+            confident = np.flatnonzero(~uncertain)
+            positions = self._confident_seen + np.arange(len(confident))
+            audit[confident[positions % self.audit_every == 0]] = True
+            self._confident_seen += len(confident)
+
+        rerun = np.flatnonzero(uncertain | audit)
+        if len(rerun):
+            full = self.predict_fn([frames[i] for i in rerun])
+            for i, result in zip(rerun, full):
+                if uncertain[i]:
+                    detections[i] = result
+                elif (result.max_conf >= self.threshold) != (conf[i] >= self.threshold):
+                    self.disagreed += 1
+
+        self.frames += len(frames)
+        self.refined += int(uncertain.sum())
+        self.audited += int(audit.sum())
+        return detections, uncertain
+
+    @property
+    def agreement(self):
+        """Fraction of audited frames where triage and full size made the same decision."""
+        return 1 - self.disagreed / self.audited if self.audited else None
+
+    def stats(self):
+        return {"cascade_frames": self.frames, "cascade_refined": self.refined,
+                "cascade_audited": self.audited, "cascade_disagreed": self.disagreed}
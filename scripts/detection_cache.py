@@ -0,0 +1,111 @@
+import os
+from pathlib import Path
+import numpy as np
+from inference_backend import FrameDetections
+
+
+class VideoDetectionLog:
+    """Collects the detections for every sampled frame of one video.
+
+    Frames the scene gate matched to an earlier frame share that frame's
+    boxes instead of storing a copy; ``inferred`` tells them apart. With a
+    ``frame_hash`` (dhash) for every frame, the file also keeps a
+    ``frame_hash`` column so dedup can be replayed without the pixels.
+    """
+    def __init__(self):
+        self.frame_index, self.inferred, self.max_conf = [], [], []
+        self.box_start, self.box_count = [], []
+        self.xyxy, self.conf, self.cls = [], [], []
+        self.frame_hash = []
+        self.orig_shape = (0, 0)
+        self._boxes = 0
+        self._last, self._last_start = None, 0
+
+    def __len__(self):
+        return len(self.frame_index)
+
+    def add(self, frame_index, detections, inferred=True, frame_hash=None):
+        if detections is not self._last:
+            self._last = detections
+            self._last_start = self._boxes
+            self.xyxy.append(detections.xyxy)
+            self.conf.append(detections.conf)
+            self.cls.append(detections.cls)
+            self._boxes += len(detections)
+            self.orig_shape = detections.orig_shape[:2]
+        self.frame_index.append(frame_index)
+        self.inferred.append(inferred)
+        self.max_conf.append(detections.max_conf)
+        self.box_start.append(self._last_start)
+        self.box_count.append(len(detections))
+        self.frame_hash.append(frame_hash)
+
+    def arrays(self):
+        def concat(parts, shape):
+            return np.concatenate(parts).astype(np.float32) if parts else np.zeros(shape, np.float32)
+        arrays = {
+            "frame_index": np.asarray(self.frame_index, np.int64),
+            "inferred": np.asarray(self.inferred, bool),
+            "max_conf": np.asarray(self.max_conf, np.float32),
+            "box_start": np.asarray(self.box_start, np.int64),
+            "box_count": np.asarray(self.box_count, np.int32),
+            "xyxy": concat(self.xyxy, (0, 4)).reshape(-1, 4),
+            "conf": concat(self.conf, (0,)),
+            "cls": concat(self.cls, (0,)),
+            "orig_shape": np.asarray(self.orig_shape, np.int32),
+        }
+        if self.frame_hash and None not in self.frame_hash:
+            arrays["frame_hash"] = np.asarray(self.frame_hash, np.uint64)
+        return arrays
+
+
+class VideoDetections:
+    """One video's cached detections, as loaded from its .npz file."""
+    def __init__(self, video_id, arrays):
+        self.video_id = video_id
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def __len__(self):
+        return len(self.frame_index)
+
+    def detections(self, i):
+        """FrameDetections for the i-th sampled frame."""
+        start, count = int(self.box_start[i]), int(self.box_count[i])
+        xyxy = self.xyxy[start:start + count]
+        h, w = (int(v) for v in self.orig_shape)
+        scale = np.array([w, h, w, h], np.float32) if h and w else np.ones(4, np.float32)
+        xywhn = np.column_stack([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]]) / scale
+        return FrameDetections(xyxy, xywhn.astype(np.float32), self.conf[start:start + count],
+                               self.cls[start:start + count], (h, w))
+
+
+class DetectionCache:
+    """Per-video columnar detection files under ``root/<model key>/<video id>.npz``.
+
+    Each file holds one row per sampled frame (frame index, max confidence,
+    whether the model ran on it) and a flat table of boxes the rows point
+    into, so a threshold can be re-applied without decoding the video.
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, model_key, video_id):
+        return self.root / model_key / f"{video_id}.npz"
+
+    def save(self, model_key, video_id, log):
+        path = self.path(model_key, video_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez_compressed(tmp_path, **log.arrays())
+        os.replace(tmp_path, path)
+
+    def load(self, model_key, video_id):
+        with np.load(self.path(model_key, video_id)) as data:
+            return VideoDetections(video_id, {name: data[name] for name in data.files})
+
+    def video_ids(self, model_key):
+        folder = self.root / model_key
+        if not folder.exists():
+            return []
+        return sorted(p.stem for p in folder.glob("*.npz") if not p.name.startswith("."))
@@ -0,0 +1,138 @@
+import os
+import random
+import threading
+import time
+import logging
+from collections import deque
+from pathlib import Path
+
+
+class DownloadManager:
+    """Downloads upcoming videos in the background while the current one is processed.
+
+    ``download_fn(url, video_id, temp_dir)`` does the actual download (and its
+    own retries) and returns the file path or None. At most ``prefetch``
+    videos are downloading or waiting to be consumed at any time, no more
+    than ``max_concurrent`` download at once, and no new download starts
+    while ``temp_dir`` holds more than ``disk_budget_bytes``.
+    """
+    def __init__(self, temp_dir, download_fn, prefetch=3, max_concurrent=2,
+                 disk_budget_bytes=5 * 1024**3, delay_range=(2, 5)):
+        self.temp_dir = Path(temp_dir)
+        self.download_fn = download_fn
+        self.prefetch = max(1, prefetch)
+        self.disk_budget_bytes = disk_budget_bytes
+        self.delay_range = delay_range
+
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._ready = deque()
+        self._in_flight = 0
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"downloader-{i}", daemon=True)
+            for i in range(max(1, max_concurrent))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def add(self, url, video_id):
+        with self._cond:
+            self._pending.append((url, video_id))
+            self._cond.notify_all()
+
+    def next_ready(self):
+        """Block until a download finishes and return ``(url, video_id, path)``.
+
+        ``path`` is None if the download failed. Returns None once nothing is
+        queued or downloading.
+        """
+        with self._cond:
+            while not self._ready:
+                if self._closed or (not self._pending and self._in_flight == 0):
+                    return None
+                self._cond.wait()
+            item = self._ready.popleft()
+            self._cond.notify_all()
+            return item
+
+    def depths(self):
+        """Queue depths: waiting to start, downloading, and downloaded but not yet taken."""
+        with self._cond:
+            return {"pending": len(self._pending), "in_flight": self._in_flight, "ready": len(self._ready)}
+
+    def discard_pending(self):
+        """Drop queued URLs that have not started downloading."""
+        with self._cond:
+            dropped = list(self._pending)
+            self._pending.clear()
+            self._cond.notify_all()
+            return dropped
+
+    def close(self):
+        """Stop starting downloads; in-flight ones finish in the background."""
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def _temp_bytes(self):
+        total = 0
+        if self.temp_dir.exists():
+            with os.scandir(self.temp_dir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            total += entry.stat().st_size
+                    except OSError:
+                        continue
+        return total
+
+    def _can_start(self):
+        if not self._pending:
+            return False
+        if self._in_flight + len(self._ready) >= self.prefetch:
+            return False
+        # Always allow one download when nothing is buffered so a single
+        # oversized video can't stall the pipeline.
+        if self._in_flight + len(self._ready) == 0:
+            return True
+        return self._temp_bytes() < self.disk_budget_bytes
+
+    def _worker_loop(self):
+        last_finished = 0.0
+        while True:
+            with self._cond:
+                while not self._closed and not self._can_start():
+                    # Re-check the disk budget periodically as files are consumed
+                    self._cond.wait(timeout=1.0)
+                if self._closed:
+                    return
+                url, video_id = self._pending.popleft()
+                self._in_flight += 1
+
+            # Random delay 2-5 seconds between downloads to reduce throttling risk
+            if self.delay_range and last_finished:
+                wait = random.uniform(*self.delay_range) - (time.monotonic() - last_finished)
+                if wait > 0:
+                    time.sleep(wait)
+
+            path = None
+            try:
+                path = self.download_fn(url, video_id, self.temp_dir)
+            except Exception as e:
+                print(f"❌ Download failed for {url}: {e}")
+                logging.error(f"Download failed for {url}: {e}")
+            last_finished = time.monotonic()
+
+            with self._cond:
+                self._in_flight -= 1
+                if self._closed:
+                    if path is not None and Path(path).exists():
+                        try:
+                            Path(path).unlink()
+                        except OSError:
+                            pass
+                else:
+                    self._ready.append((url, video_id, path))
+                self._cond.notify_all()
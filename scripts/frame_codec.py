@@ -0,0 +1,160 @@
+import argparse
+import json
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = REPO_ROOT / "logs" / "eval_reports" / "benchmarks"
+BENCH_IMAGES_DIR = REPO_ROOT / "data" / "raw"
+BENCH_SPECS = ("png:1", "png:3", "png:6", "png:9", "jpeg:95", "jpeg:90", "webp:90", "webp:101")
+
+# format: (file extension, cv2 quality flag, default quality, valid range)
+FORMATS = {
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION, 1, (0, 9)),       # zlib level; lossless at any level
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, 95, (0, 100)),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, 90, (1, 101)),     # 101 is lossless
+}
+EXTENSIONS = {ext: name for name, (ext, *_) in FORMATS.items()} | {".jpeg": "jpeg"}
+
+
+class FrameEncoder:
+    """Encodes frames to one image format, given as a spec like "png:1", "jpeg:95" or "webp:90".
+
+    The number is the PNG compression level or the JPEG/WebP quality; a bare
+    format name uses its default. ``spec`` is what gets recorded in the
+    frame manifest.
+    """
+    def __init__(self, spec="png"):
+        name, _, level = spec.lower().partition(":")
+        if name == "jpg":
+            name = "jpeg"
+        if name not in FORMATS:
+            raise ValueError(f"Unknown frame format '{spec}', expected one of {tuple(FORMATS)}")
+        self.ext, flag, default, (low, high) = FORMATS[name]
+        self.format = name
+        self.level = int(level) if level else default
+        if not low <= self.level <= high:
+            raise ValueError(f"{name} level must be within {low}-{high}, got {self.level}")
+        self.spec = f"{name}:{self.level}"
+        self._params = [flag, self.level]
+
+    def __repr__(self):
+        return f"FrameEncoder({self.spec!r})"
+
+    @classmethod
+    def for_path(cls, path, spec=None):
+        """The encoder a frame was saved with: its manifest ``spec`` if known, else its extension's default."""
+        if spec:
+            return cls(spec)
+        return cls(EXTENSIONS.get(Path(path).suffix.lower(), "png"))
+
+    def encode(self, frame):
+        """Return the encoded bytes as a uint8 array, or None if encoding failed."""
+        ok, encoded = cv2.imencode(self.ext, frame, self._params)
+        return encoded if ok else None
+
+    def write(self, path, frame):
+        """Encode ``frame`` to ``path``; returns the bytes written, or 0 on failure."""
+        encoded = self.encode(frame)
+        if encoded is None:
+            return 0
+        with open(path, "wb") as f:
+            f.write(encoded.tobytes())
+        return len(encoded)
+
+
+def read_frame(path, flags=cv2.IMREAD_COLOR):
+    """Read a saved frame in any supported format; None if it can't be read."""
+    return cv2.imread(str(path), flags)
+
+
+# --- Benchmark ---
+def _load_frames(image_dir, limit):
+    paths = sorted(p for p in Path(image_dir).rglob("frame_*") if p.suffix.lower() in EXTENSIONS)[:limit]
+    frames = [frame for frame in (read_frame(p, cv2.IMREAD_UNCHANGED) for p in paths) if frame is not None]
+    if frames:
+        return frames, str(image_dir)
+    # No saved frames yet: fall back to the pipeline benchmark's synthetic video
+    from benchmark_pipeline import synthetic_video
+    cap = cv2.VideoCapture(str(synthetic_video(1280, 720, 300)))
+    for _ in range(limit):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+        for _ in range(9):
+            cap.grab()
+    cap.release()
+    return frames, "synthetic 1280x720"
+
+
+def benchmark(frames, specs):
+    """Encode and decode every frame with each spec; returns one result row per spec."""
+    rows = []
+    for spec in specs:
+        encoder = FrameEncoder(spec)
+        encode_seconds = decode_seconds = 0.0
+        total_bytes, psnrs = 0, []
+        for frame in frames:
+            start = time.perf_counter()
+            encoded = encoder.encode(frame)
+            encode_seconds += time.perf_counter() - start
+            if encoded is None:
+                break
+            start = time.perf_counter()
+            decoded = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+            decode_seconds += time.perf_counter() - start
+            total_bytes += len(encoded)
+            if decoded is not None and decoded.ndim == 3 and frame.ndim == 2:
+                decoded = cv2.cvtColor(decoded, cv2.COLOR_BGR2GRAY)  # WebP always decodes to 3 channels
+            if decoded is not None and decoded.shape == frame.shape:
+                psnrs.append(cv2.PSNR(frame, decoded))
+        if encoded is None:
+            print(f"⚠️ {spec} can't encode these frames; skipping it.")
+            continue
+        n = len(frames)
+        lossy = [p for p in psnrs if p < 100]  # Identical images score 361 dB (or inf)
+        rows.append({
+            "format": encoder.spec,
+            "encode_ms": round(1000 * encode_seconds / n, 2),
+            "decode_ms": round(1000 * decode_seconds / n, 2),
+            "kb_per_frame": round(total_bytes / n / 1024, 1),
+            "psnr_db": round(float(np.mean(lossy)), 2) if lossy else None,  # None: lossless
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare frame encoding formats: speed, size and fidelity.")
+    parser.add_argument("--formats", type=lambda s: s.split(","), default=list(BENCH_SPECS),
+                        help="Comma-separated specs, e.g. png:1,jpeg:95,webp:90")
+    parser.add_argument("--images", type=Path, default=BENCH_IMAGES_DIR, help="Saved frames to encode")
+    parser.add_argument("--limit", type=int, default=50, help="Frames to use")
+    parser.add_argument("--greyscale", action="store_true", help="Convert the frames to one channel first")
+    args = parser.parse_args()
+
+    frames, source = _load_frames(args.images, args.limit)
+    if not frames:
+        print("❌ No frames to benchmark.")
+        return
+    if args.greyscale:
+        frames = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) if f.ndim == 3 else f for f in frames]
+    print(f"🖼️ Benchmarking {len(args.formats)} formats on {len(frames)} frames from {source}...")
+    rows = benchmark(frames, args.formats)
+    for row in rows:
+        psnr = "lossless" if row["psnr_db"] is None else f"{row['psnr_db']} dB"
+        print(f"⏱️ {row['format']:>9}: encode {row['encode_ms']} ms, decode {row['decode_ms']} ms, "
+              f"{row['kb_per_frame']} KB/frame, {psnr}")
+
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = BENCH_DIR / f"codecs_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out_path, "w") as f:
+        json.dump({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "source": source, "frames": len(frames),
+                   "shape": list(frames[0].shape), "opencv": cv2.__version__, "results": rows}, f, indent=2)
+    print(f"💾 Saved results to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
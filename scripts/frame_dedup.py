@@ -0,0 +1,81 @@
+import os
+from pathlib import Path
+import cv2
+import numpy as np
+from frame_ids import FileLock
+
+HASH_SIZE = 8  # 8x8 difference hash -> 64 bits
+
+
+def dhash(frame, hash_size=HASH_SIZE):
+    """64-bit difference hash of a BGR or greyscale frame.
+
+    The frame is shrunk to (hash_size+1) x hash_size greyscale and each bit
+    records whether a pixel is brighter than its right neighbour, so the
+    hash survives re-encoding, small shifts and exposure changes.
+    """
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(frame, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class HashIndex:
+    """Append-only set of 64-bit hashes searchable by Hamming distance.
+
+    With a ``path`` the index is loaded from and saved to a .npy file so it
+    persists across runs. Saving merges in hashes other processes have
+    saved since this index was loaded.
+    """
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._size = 0
+        self._persisted = 0  # Entries before this index are already on disk
+        if self.path and self.path.exists():
+            self._replace(self._load())
+
+    def _load(self):
+        try:
+            return np.load(self.path).astype(np.uint64)
+        except Exception as e:
+            print(f"⚠️ Could not load hash index {self.path}: {e}")
+            return np.zeros(0, dtype=np.uint64)
+
+    def _replace(self, hashes):
+        self._hashes = np.concatenate([hashes, np.zeros(1024, dtype=np.uint64)])
+        self._size = self._persisted = len(hashes)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value):
+        if self._size == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+        self._hashes[self._size] = value
+        self._size += 1
+
+    def contains_near(self, value, max_distance):
+        """True if any stored hash is within ``max_distance`` bits of ``value``."""
+        if self._size == 0:
+            return False
+        distances = _popcount(self._hashes[:self._size] ^ np.uint64(value))
+        return bool(distances.min() <= max_distance)
+
+    def save(self):
+        if not self.path or self._persisted == self._size:
+            return
+        with FileLock(self.path):
+            on_disk = self._load() if self.path.exists() else np.zeros(0, dtype=np.uint64)
+            merged = np.concatenate([on_disk, self._hashes[self._persisted:self._size]])
+            tmp_path = self.path.with_name(self.path.stem + ".tmp.npy")
+            np.save(tmp_path, merged)
+            os.replace(tmp_path, self.path)
+        self._replace(merged)
@@ -0,0 +1,146 @@
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+FRAME_NAME_RE = re.compile(r"^frame_(\d+)$")
+
+
+def atomic_write_text(path, text):
+    """Write text via a temp file + rename so readers never see a partial file."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class FileLock:
+    """Cross-process lock held by exclusively creating ``<path>.lock``.
+
+    A lock file older than ``stale_after`` seconds is assumed to belong to a
+    crashed process and is broken.
+    """
+    def __init__(self, path, stale_after=30.0):
+        self.lock_path = Path(str(path) + ".lock")
+        self.stale_after = stale_after
+
+    def __enter__(self):
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - self.lock_path.stat().st_mtime > self.stale_after:
+                        self.lock_path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.01)
+
+    def __exit__(self, *exc):
+        try:
+            self.lock_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class FrameIdAllocator:
+    """Hands out frame IDs, persisting them in reserved blocks.
+
+    The counter file always holds the first ID that has *not* been reserved,
+    and it is written before any ID in a block is handed out. A crash can
+    therefore leave a gap in the numbering but never reuse an ID. On startup
+    the stored value is reconciled with the frames actually on disk in case
+    the file was lost or rolled back.
+
+    Several processes can share one counter file: blocks are reserved under
+    a FileLock, so each process gets disjoint ranges. Frames saved somewhere
+    other than ``frames_dir`` (e.g. straight to data/processed) are found
+    by also scanning ``mirror_dirs``.
+    """
+    def __init__(self, counter_file, frames_dir, block_size=256, mirror_dirs=()):
+        self.counter_file = Path(counter_file)
+        self.frames_dir = Path(frames_dir)
+        self.mirror_dirs = [Path(d) for d in mirror_dirs]
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._next = self._recover()
+        self._reserved_end = self._next
+
+    @property
+    def next_id(self):
+        """The ID the next call to allocate() will return."""
+        return self._next
+
+    def allocate(self):
+        with self._lock:
+            if self._next >= self._reserved_end:
+                self._reserve_block()
+            frame_id = self._next
+            self._next += 1
+            return frame_id
+
+    def _reserve_block(self):
+        with FileLock(self.counter_file):
+            # Another process may have reserved past us since our last block
+            stored = self._read_counter()
+            self._next = max(stored or 0, self._next)
+            self._reserved_end = self._next + self.block_size
+            atomic_write_text(self.counter_file, str(self._reserved_end))
+
+    def close(self):
+        """Hand the unused part of the current block back."""
+        with self._lock:
+            if self._reserved_end <= self._next:
+                return
+            with FileLock(self.counter_file):
+                # Only possible if nobody has reserved a later block since
+                if self._read_counter() == self._reserved_end:
+                    atomic_write_text(self.counter_file, str(self._next))
+            self._reserved_end = self._next
+
+    def _read_counter(self):
+        try:
+            return int(self.counter_file.read_text().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _scan_frames_dir(self, directory=None):
+        """One past the highest frame ID on disk.
+
+        Frames sit either directly in ``frames_dir`` or in numbered shard
+        directories, which are named so the last one holds the highest IDs;
+        only that branch is descended, so this stays cheap as frames pile up.
+        """
+        directory = directory or self.frames_dir
+        highest = -1
+        last_shard = None
+        if directory.exists():
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if entry.name.isdigit() and (last_shard is None or entry.name > last_shard):
+                            last_shard = entry.name
+                        continue
+                    match = FRAME_NAME_RE.match(os.path.splitext(entry.name)[0])
+                    if match:
+                        highest = max(highest, int(match.group(1)))
+        if last_shard is not None:
+            highest = max(highest, self._scan_frames_dir(directory / last_shard) - 1)
+        return highest + 1
+
+    def _recover(self):
+        stored = self._read_counter()
+        on_disk = max(self._scan_frames_dir(d) for d in (self.frames_dir, *self.mirror_dirs))
+        if stored is None and self.counter_file.exists():
+            print(f"⚠️ Frame counter file is unreadable; resuming from frames on disk ({on_disk}).")
+        elif stored is not None and on_disk > stored:
+            print(f"⚠️ Frame counter {stored} is behind frames on disk; resuming from {on_disk}.")
+        return max(stored or 0, on_disk)
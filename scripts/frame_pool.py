@@ -0,0 +1,43 @@
+import threading
+import numpy as np
+
+
+class FramePool:
+    """Fixed set of reusable frame buffers, so decoding doesn't allocate per frame.
+
+    The decoder acquire()s a buffer and reads into it in place; whoever
+    finishes with the frame last (the filter loop, or the writer after
+    encoding) release()s it. At most ``size`` buffers exist at once and
+    acquire() blocks while all of them are out, which puts a hard bound on
+    the decoded frames one video can hold in memory.
+
+    Until the frame shape is known, acquire() hands out a zero-size
+    placeholder that the capture replaces on read; release() adopts the
+    first real frame's shape and keeps frames of that shape for reuse.
+    """
+    def __init__(self, size, shape=None, dtype=np.uint8):
+        self.size = size
+        self.shape = tuple(shape) if shape else None
+        self.dtype = dtype
+        self.in_use = 0
+        self._free = []
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Take a free buffer; returns None if ``timeout`` passes while all are in use."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_use < self.size, timeout):
+                return None
+            self.in_use += 1
+            if self._free:
+                return self._free.pop()
+            return np.empty(self.shape if self.shape else (0,), self.dtype)
+
+    def release(self, frame):
+        with self._cond:
+            self.in_use -= 1
+            if self.shape is None and frame.size:
+                self.shape = frame.shape
+            if frame.shape == self.shape and frame.dtype == self.dtype:
+                self._free.append(frame)
+            self._cond.notify()
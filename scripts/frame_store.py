@@ -0,0 +1,165 @@
+import csv
+import io
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+from frame_ids import FRAME_NAME_RE, FileLock
+from storage_budget import StorageBudget
+
+ID_WIDTH = 10            # frame_0000000042.png
+FRAMES_PER_DIR = 1000    # Leaf directories hold at most this many frames
+DIRS_PER_SHARD = 1000    # ...and each top-level shard this many leaf directories
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_COLUMNS = ["frame_id", "video_id", "frame_index", "confidence", "path", "status", "format"]
+
+FrameRecord = namedtuple("FrameRecord", MANIFEST_COLUMNS)
+
+
+# --- Layout ---
+def frame_dir(frame_id):
+    """Shard directory for a frame, relative to the frames root: ``0000/042``."""
+    leaf = frame_id // FRAMES_PER_DIR
+    return Path(f"{leaf // DIRS_PER_SHARD:04}") / f"{leaf % DIRS_PER_SHARD:03}"
+
+
+def frame_name(frame_id, ext=".png"):
+    return f"frame_{frame_id:0{ID_WIDTH}}{ext}"
+
+
+def frame_relpath(frame_id, ext=".png", name=None):
+    """Where a frame lives under the frames root. ``name`` keeps a legacy file name."""
+    return frame_dir(frame_id) / (name or frame_name(frame_id, ext))
+
+
+# --- Manifest ---
+class FrameManifest:
+    """Append-only CSV index of the frames under ``root``.
+
+    Each row records a frame's ID, source video, frame index, detection
+    confidence, path relative to ``root`` and encoding (a FrameEncoder spec
+    such as "png:1"). Rows are never rewritten: a frame that is later
+    deleted gets a second row with status "evicted", and the last row for
+    an ID wins. Single-line appends are atomic, so several processes can
+    append to one manifest.
+
+    Columns are read by position, so manifests started before a column was
+    added (and their shorter header) still load, with the new column empty.
+    """
+    def __init__(self, root, name=MANIFEST_NAME):
+        self.root = Path(root)
+        self.path = self.root / name
+        self._lock = threading.Lock()
+
+    def _append_rows(self, rows):
+        with self._lock:
+            if not self.path.exists():
+                self.root.mkdir(parents=True, exist_ok=True)
+                with FileLock(self.path):
+                    if not self.path.exists():
+                        with open(self.path, "w", newline="") as f:
+                            csv.writer(f).writerow(MANIFEST_COLUMNS)
+            text = io.StringIO()
+            csv.writer(text).writerows([["" if value is None else value for value in row] for row in rows])
+            # One write per call so concurrent appenders never interleave within a row
+            with open(self.path, "a", newline="") as f:
+                f.write(text.getvalue())
+
+    def append(self, frame_id, relpath, video_id=None, frame_index=None, confidence=None, fmt=None):
+        self.append_many([(frame_id, relpath, video_id, frame_index, confidence, fmt)])
+
+    def append_many(self, frames):
+        """Record saved frames given as (frame_id, relpath, video_id, frame_index, confidence, fmt)."""
+        self._append_rows([
+            (frame_id, video_id, frame_index, None if confidence is None else f"{confidence:.4f}",
+             Path(relpath).as_posix(), "saved", fmt)
+            for frame_id, relpath, video_id, frame_index, confidence, fmt in frames
+        ])
+
+    def mark_evicted(self, frame_ids):
+        if frame_ids:
+            self._append_rows([(frame_id, None, None, None, None, "evicted") for frame_id in frame_ids])
+
+    def records(self):
+        """Live frames in ID order, as FrameRecords with ``frame_id`` as an int."""
+        if not self.path.exists():
+            return []
+        latest = {}
+        width = len(MANIFEST_COLUMNS)
+        with open(self.path, "r", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Header
+            for row in reader:
+                try:
+                    frame_id = int(row[0])
+                except (IndexError, ValueError):
+                    continue  # A torn final line from a crash
+                row = (row + [""] * width)[:width]
+                record = FrameRecord(frame_id, *row[1:])
+                if record.status == "evicted":
+                    latest.pop(frame_id, None)
+                else:
+                    latest[frame_id] = record
+        return [latest[frame_id] for frame_id in sorted(latest)]
+
+    def paths(self, root=None):
+        """Absolute paths of the live frames, optionally re-rooted (e.g. to data/processed)."""
+        root = Path(root) if root else self.root
+        return [root / record.path for record in self.records()]
+
+
+# --- Migration ---
+def migrate_flat_frames(root, manifest, mirror_dirs=()):
+    """Move frames left flat in ``root`` into shard directories and index them.
+
+    Frames keep their file name, so existing label files still match. The
+    same move is applied in each of ``mirror_dirs`` (e.g. data/processed),
+    including to copies still flat there after ``root`` was migrated without
+    them. Returns a list of (frame_id, new relative path) for the frames
+    moved in ``root``.
+    """
+    root = Path(root)
+    bases = [root, *map(Path, mirror_dirs)]
+    flat = set()
+    for base in bases:
+        if base.exists():
+            with os.scandir(base) as entries:
+                flat.update(entry.name for entry in entries
+                            if entry.is_file() and FRAME_NAME_RE.match(os.path.splitext(entry.name)[0]))
+    moves, mirrored = [], 0
+    for name in sorted(flat):
+        frame_id = int(FRAME_NAME_RE.match(os.path.splitext(name)[0]).group(1))
+        relpath = frame_relpath(frame_id, name=name)
+        in_root = (root / name).exists()
+        for base in bases:
+            source = base / name
+            if source.exists():
+                (base / relpath).parent.mkdir(parents=True, exist_ok=True)
+                os.replace(source, base / relpath)
+        if in_root:
+            moves.append((frame_id, relpath))
+        else:
+            mirrored += 1
+    if moves:
+        manifest.append_many([(frame_id, relpath, None, None, None, None) for frame_id, relpath in moves])
+        print(f"🗂️ Moved {len(moves)} frames into sharded folders under {root}.")
+    if mirrored:
+        print(f"🗂️ Moved {mirrored} copies left flat in {', '.join(map(str, mirror_dirs))} into sharded folders.")
+    return moves
+
+
+def migrate_frames(raw_dir, processed_dir, db_path, manifest):
+    """Shard legacy flat frames in ``raw_dir`` together with their ``processed_dir`` copies.
+
+    Every tool that reads frames calls this first, so whichever one runs
+    first after an upgrade moves both copies, and the storage budget's
+    index in ``db_path`` is pointed at the new paths.
+    """
+    moves = migrate_flat_frames(raw_dir, manifest, mirror_dirs=(processed_dir,))
+    if moves:
+        budget = StorageBudget(raw_dir, db_path, budget_bytes=0, manifest=manifest)
+        try:
+            budget.relocate(moves)
+        finally:
+            budget.close()
+    return moves
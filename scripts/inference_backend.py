@@ -0,0 +1,280 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+# --- CONFIG ---
+REPO_ROOT = Path(__file__).resolve().parent.parent
+MODEL_PATH = REPO_ROOT / "models" / "frc_bumper_run" / "weights" / "best.pt"
+CALIBRATION_DIR = REPO_ROOT / "data" / "split" / "val" / "images"
+REPORTS_DIR = REPO_ROOT / "logs" / "eval_reports"
+BACKENDS = ("pytorch", "onnx", "onnx-int8")
+IMGSZ = 640
+CALIBRATION_IMAGES = 200  # Images used for INT8 calibration and accuracy checks
+CONFIDENCE_THRESHOLD = 0.5
+
+_hash_cache = {}
+
+
+def weights_hash(weights=MODEL_PATH):
+    """Short sha256 of a weights file, cached per path and mtime."""
+    weights = Path(weights)
+    stat = weights.stat()
+    key = (str(weights.resolve()), stat.st_mtime_ns, stat.st_size)
+    if key not in _hash_cache:
+        digest = hashlib.sha256()
+        with open(weights, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _hash_cache[key] = digest.hexdigest()[:16]
+    return _hash_cache[key]
+
+
+def model_key(backend, weights=MODEL_PATH):
+    """Identifies the detections a backend produces from a weights file."""
+    return f"{weights_hash(weights)}-{backend}"
+
+
+def _export_path(weights, suffix):
+    # Exports live next to the weights and carry their hash, so retraining
+    # best.pt never picks up a stale export.
+    weights = Path(weights)
+    return weights.with_name(f"{weights.stem}-{weights_hash(weights)}{suffix}")
+
+
+def list_images(image_dir, limit=None):
+    image_dir = Path(image_dir)
+    if not image_dir.exists():
+        return []
+    images = sorted(p for p in image_dir.glob("*") if p.suffix.lower() in [".png", ".jpg", ".jpeg", ".webp"])
+    return images[:limit] if limit else images
+
+
+def letterbox(image, size=IMGSZ):
+    """Resize keeping aspect ratio and pad to a square, as YOLO does."""
+    h, w = image.shape[:2]
+    ratio = min(size / h, size / w)
+    nh, nw = round(h * ratio), round(w * ratio)
+    resized = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+    return canvas
+
+
+# --- Export ---
+def export_onnx(weights=MODEL_PATH, imgsz=IMGSZ):
+    """Export weights to ONNX with a dynamic batch axis, reusing a cached export."""
+    target = _export_path(weights, ".onnx")
+    if target.exists():
+        return target
+    print(f"📦 Exporting {Path(weights).name} to ONNX...")
+    exported = Path(YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True))
+    os.replace(exported, target)
+    return target
+
+
+class _CalibrationReader:
+    """Feeds letterboxed validation images to the ONNX Runtime quantizer."""
+    def __init__(self, input_name, image_paths, imgsz):
+        self.input_name = input_name
+        self.image_paths = list(image_paths)
+        self.imgsz = imgsz
+
+    def get_next(self):
+        while self.image_paths:
+            image = cv2.imread(str(self.image_paths.pop(0)))
+            if image is None:
+                continue
+            rgb = cv2.cvtColor(letterbox(image, self.imgsz), cv2.COLOR_BGR2RGB)
+            tensor = rgb.transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+            return {self.input_name: tensor}
+        return None
+
+
+def export_onnx_int8(weights=MODEL_PATH, calibration_dir=CALIBRATION_DIR, imgsz=IMGSZ):
+    """Statically quantize the ONNX export to INT8, calibrated on validation images."""
+    target = _export_path(weights, "-int8.onnx")
+    if target.exists():
+        return target
+    try:
+        import onnxruntime as ort
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    except ImportError:
+        raise RuntimeError("INT8 export needs onnxruntime: pip install onnxruntime")
+
+    images = list_images(calibration_dir, CALIBRATION_IMAGES)
+    if not images:
+        raise RuntimeError(f"No calibration images found in {calibration_dir}")
+
+    fp32_path = export_onnx(weights, imgsz)
+    input_name = ort.InferenceSession(str(fp32_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    print(f"🧮 Quantizing to INT8 with {len(images)} calibration images...")
+    tmp_path = target.with_name(target.stem + ".tmp.onnx")
+    quantize_static(
+        str(fp32_path), str(tmp_path),
+        _CalibrationReader(input_name, images, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    os.replace(tmp_path, target)
+    return target
+
+
+# --- Accuracy ---
+def _max_confidences(model, image_paths, batch_size=16):
+    confs, boxes, elapsed = [], [], 0.0
+    for i in range(0, len(image_paths), batch_size):
+        imgs = [cv2.imread(str(p)) for p in image_paths[i:i + batch_size]]
+        imgs = [img for img in imgs if img is not None]
+        if not imgs:
+            continue
+        start = time.perf_counter()
+        results = model.predict(imgs, verbose=False)
+        elapsed += time.perf_counter() - start
+        for result in results:
+            n = 0 if result.boxes is None else len(result.boxes)
+            confs.append(float(result.boxes.conf.max()) if n else 0.0)
+            boxes.append(n)
+    return np.array(confs), np.array(boxes), elapsed
+
+
+def compare_backends(baseline, candidate, image_paths, conf_threshold=CONFIDENCE_THRESHOLD):
+    """Compare a candidate model's detections against a baseline on the same images."""
+    base_conf, base_boxes, base_time = _max_confidences(baseline, image_paths)
+    cand_conf, cand_boxes, cand_time = _max_confidences(candidate, image_paths)
+    n = len(base_conf)
+    if n == 0 or len(cand_conf) != n:
+        return {"images": n}
+    base_pos = base_conf >= conf_threshold
+    cand_pos = cand_conf >= conf_threshold
+    return {
+        "images": n,
+        "decision_agreement": float(np.mean(base_pos == cand_pos)),
+        "baseline_positives": int(base_pos.sum()),
+        "candidate_positives": int(cand_pos.sum()),
+        "mean_abs_max_conf_delta": float(np.mean(np.abs(cand_conf - base_conf))),
+        "mean_box_count_delta": float(np.mean(cand_boxes - base_boxes)),
+        "baseline_ms_per_image": 1000 * base_time / n,
+        "candidate_ms_per_image": 1000 * cand_time / n,
+    }
+
+
+def report_accuracy(backend, weights=MODEL_PATH, image_dir=CALIBRATION_DIR, limit=CALIBRATION_IMAGES):
+    """Score a backend against the PyTorch baseline and save the report as JSON."""
+    images = list_images(image_dir, limit)
+    if not images:
+        print(f"⚠️ No images in {image_dir}; skipping accuracy check for {backend}.")
+        return None
+    report = compare_backends(YOLO(weights), load_model(backend, weights, check_accuracy=False), images)
+    report.update({"backend": backend, "weights_hash": weights_hash(weights)})
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(REPORTS_DIR / f"backend_{backend}.json", "w") as f:
+        json.dump(report, f, indent=2)
+    if "decision_agreement" in report:
+        print(f"📊 {backend} vs pytorch on {report['images']} images: "
+              f"{report['decision_agreement']:.1%} decision agreement, "
+              f"mean |Δconf| {report['mean_abs_max_conf_delta']:.4f}, "
+              f"{report['baseline_ms_per_image']:.1f} → {report['candidate_ms_per_image']:.1f} ms/image")
+    return report
+
+
+# --- Detections ---
+class FrameDetections:
+    """Plain-numpy copy of one frame's detections.
+
+    Small and picklable, unlike ultralytics Results, so it can be kept
+    around or sent between processes.
+    """
+    __slots__ = ("xyxy", "xywhn", "conf", "cls", "orig_shape")
+
+    def __init__(self, xyxy, xywhn, conf, cls, orig_shape):
+        self.xyxy = xyxy
+        self.xywhn = xywhn
+        self.conf = conf
+        self.cls = cls
+        self.orig_shape = tuple(orig_shape)
+
+    @classmethod
+    def from_result(cls, result):
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty(result.orig_shape)
+        return cls(
+            np.asarray(boxes.xyxy.cpu().numpy(), dtype=np.float32),
+            np.asarray(boxes.xywhn.cpu().numpy(), dtype=np.float32),
+            np.asarray(boxes.conf.cpu().numpy(), dtype=np.float32),
+            np.asarray(boxes.cls.cpu().numpy(), dtype=np.float32),
+            result.orig_shape,
+        )
+
+    @classmethod
+    def empty(cls, orig_shape):
+        return cls(np.zeros((0, 4), np.float32), np.zeros((0, 4), np.float32),
+                   np.zeros(0, np.float32), np.zeros(0, np.float32), orig_shape)
+
+    def __len__(self):
+        return len(self.conf)
+
+    @property
+    def max_conf(self):
+        return float(self.conf.max()) if len(self.conf) else 0.0
+
+
+def predict_detections(model, frames, **kwargs):
+    """Run ``model.predict`` and return one FrameDetections per frame.
+
+    Single-channel frames are expanded to 3 channels first, as the
+    greyscale training images are when YOLO loads them.
+    """
+    if hasattr(model, "predict_detections"):
+        return model.predict_detections(frames, **kwargs)
+    frames = [cv2.cvtColor(f, cv2.COLOR_GRAY2BGR) if f.ndim == 2 else f for f in frames]
+    return [FrameDetections.from_result(r) for r in model.predict(frames, verbose=False, **kwargs)]
+
+
+# --- Loading ---
+def load_model(backend="pytorch", weights=MODEL_PATH, check_accuracy=True):
+    """Load the detector for the given backend, exporting it on first use.
+
+    A fresh export is checked against the PyTorch baseline once, and the
+    report is written to logs/eval_reports/backend_<backend>.json.
+    """
+    if backend == "pytorch":
+        return YOLO(weights)
+    if backend == "onnx":
+        exporter = export_onnx
+    elif backend == "onnx-int8":
+        exporter = export_onnx_int8
+    else:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+
+    fresh = not _export_path(weights, "-int8.onnx" if backend == "onnx-int8" else ".onnx").exists()
+    path = exporter(weights)
+    print(f"⚙️ Using {backend} inference backend: {path.name}")
+    if fresh and check_accuracy:
+        report_accuracy(backend, weights)
+    return YOLO(path, task="detect")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export best.pt to a CPU backend and check its accuracy.")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    parser.add_argument("--weights", type=Path, default=MODEL_PATH)
+    parser.add_argument("--images", type=Path, default=CALIBRATION_DIR, help="Images to compare on")
+    parser.add_argument("--limit", type=int, default=CALIBRATION_IMAGES)
+    args = parser.parse_args()
+
+    load_model(args.backend, args.weights, check_accuracy=False)
+    report_accuracy(args.backend, args.weights, args.images, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import logging
+import os
+import queue
+import time
+import traceback
+from functools import partial
+import psutil
+from batch_tuner import BatchTuner, cache_key, sample_frames
+from inference_backend import load_model, predict_detections
+
+PROBE_FRAME_SHAPE = (720, 1280, 3)  # Videos are downloaded at up to 720p
+
+
+def serve(backend, weights, requests, responses, max_batch=None, max_wait=0.02, batch_cache=None):
+    """Inference process body: batch frames from many clients into shared model calls.
+
+    Clients put ``(client_id, request_id, frames, kwargs)`` on ``requests``.
+    The server waits for the first request, then keeps collecting until it
+    holds ``max_batch`` frames or ``max_wait`` seconds have passed, runs one
+    model call per distinct set of predict kwargs, and sends each client
+    ``(request_id, detections)`` on ``responses[client_id]``. A None request
+    shuts the server down. With no ``max_batch`` the batch size is autotuned
+    and cached in ``batch_cache``.
+    """
+    model = load_model(backend, weights)
+    tuner = BatchTuner(partial(predict_detections, model), batch_size=max_batch, cache_file=batch_cache,
+                       cache_key=cache_key(backend, weights, PROBE_FRAME_SHAPE))
+    tuner.tune(sample_frames(shape=PROBE_FRAME_SHAPE))
+    print(f"🧠 Inference server ready (max batch {tuner.batch_size}, max wait {max_wait * 1000:.0f} ms).")
+    held_back = []
+    while True:
+        batch = held_back or [requests.get()]
+        held_back = []
+        if batch[0] is None:
+            return
+        frames_in_batch = sum(len(req[2]) for req in batch)
+        deadline = time.monotonic() + max_wait
+        while frames_in_batch < tuner.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                held_back = [None]
+                break
+            if frames_in_batch + len(request[2]) > tuner.batch_size:
+                held_back = [request]
+                break
+            batch.append(request)
+            frames_in_batch += len(request[2])
+
+        groups = {}
+        for request in batch:
+            groups.setdefault(tuple(sorted(request[3].items())), []).append(request)
+        for kwargs_key, group in groups.items():
+            frames = [frame for request in group for frame in request[2]]
+            try:
+                detections = tuner.predict(frames, **dict(kwargs_key))
+                error = None
+            except Exception:
+                detections, error = None, traceback.format_exc()
+                logging.error(f"Shared inference failed: {error}")
+            offset = 0
+            for client_id, request_id, client_frames, _ in group:
+                if error is None:
+                    payload = detections[offset:offset + len(client_frames)]
+                else:
+                    payload = RuntimeError(error)
+                responses[client_id].put((request_id, payload))
+                offset += len(client_frames)
+
+
+class InferenceClient:
+    """Stands in for the model inside a decoder worker, forwarding to the server.
+
+    ``server_pid`` is the inference process; a request fails with a
+    RuntimeError instead of waiting forever once that process is gone.
+    """
+    def __init__(self, client_id, requests, responses, server_pid=None, poll_interval=1.0):
+        self.client_id = client_id
+        self.requests = requests
+        self.responses = responses
+        self.server_pid = server_pid
+        self.poll_interval = poll_interval
+        self._requests_sent = 0
+        self._server = None
+
+    def _server_alive(self):
+        if self.server_pid is None:
+            return True
+        try:
+            if self._server is None:
+                self._server = psutil.Process(self.server_pid)
+            # The server is the supervisor's child, so it lingers as a zombie until joined
+            return self._server.is_running() and self._server.status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return False
+
+    def predict_detections(self, frames, **kwargs):
+        # The pid keeps IDs unique across the workers that reuse this client slot
+        request_id = (os.getpid(), self._requests_sent)
+        self._requests_sent += 1
+        self.requests.put((self.client_id, request_id, list(frames), kwargs))
+        while True:
+            try:
+                response_id, payload = self.responses.get(timeout=self.poll_interval)
+            except queue.Empty:
+                if not self._server_alive():
+                    raise RuntimeError(f"inference server (pid {self.server_pid}) is not running")
+                continue
+            # Drop answers to requests a recycled or crashed worker abandoned
+            if response_id == request_id:
+                break
+        if isinstance(payload, Exception):
+            raise payload
+        return payload
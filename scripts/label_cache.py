@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+import numpy as np
+from inference_backend import FrameDetections
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    frame_id INTEGER NOT NULL,
+    model_key TEXT NOT NULL,   -- weights hash and backend, see inference_backend.model_key
+    height INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    xyxy BLOB NOT NULL,        -- float32 arrays, one row per box
+    xywhn BLOB NOT NULL,
+    conf BLOB NOT NULL,
+    cls BLOB NOT NULL,
+    PRIMARY KEY (frame_id, model_key)
+);
+"""
+
+
+def _blob(array):
+    return np.ascontiguousarray(array, dtype=np.float32).tobytes()
+
+
+class LabelCache:
+    """Detections the scraper already computed for saved frames, keyed by frame ID and model.
+
+    The labeler reads these back instead of running the same model on the
+    same frames again. Entries for other weights or backends are ignored.
+    """
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def put(self, frame_id, model_key, detections):
+        h, w = detections.orig_shape[:2]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detections (frame_id, model_key, height, width, xyxy, xywhn, conf, cls) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (frame_id, model_key, h, w, _blob(detections.xyxy), _blob(detections.xywhn),
+                 _blob(detections.conf), _blob(detections.cls)))
+
+    def get_many(self, frame_ids, model_key):
+        """Return {frame_id: FrameDetections} for the IDs cached under ``model_key``."""
+        found = {}
+        frame_ids = list(frame_ids)
+        for i in range(0, len(frame_ids), 500):
+            chunk = frame_ids[i:i + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT frame_id, height, width, xyxy, xywhn, conf, cls FROM detections "
+                    f"WHERE model_key = ? AND frame_id IN ({','.join('?' * len(chunk))})",
+                    (model_key, *chunk)).fetchall()
+            for frame_id, h, w, xyxy, xywhn, conf, cls in rows:
+                found[frame_id] = FrameDetections(
+                    np.frombuffer(xyxy, np.float32).reshape(-1, 4),
+                    np.frombuffer(xywhn, np.float32).reshape(-1, 4),
+                    np.frombuffer(conf, np.float32),
+                    np.frombuffer(cls, np.float32),
+                    (h, w))
+        return found
@@ -1,54 +1,125 @@
 import os
-import cv2
 import torch
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from ultralytics import YOLO
 from tqdm import tqdm
+from batch_tuner import BatchTuner, cache_key, sample_frames
+from inference_backend import BACKENDS, load_model, model_key, predict_detections
+from frame_store import FrameManifest, migrate_frames
+from label_cache import LabelCache
+from frame_codec import read_frame
 
 # --- CONFIG ---
 REPO_ROOT = Path(__file__).resolve().parent.parent
 RAW_DIR = REPO_ROOT / "data" / "raw"
+PROCESSED_DIR = REPO_ROOT / "data" / "processed"
 LABEL_DIR = REPO_ROOT / "data" / "labels"
 LABEL_DIR.mkdir(parents=True, exist_ok=True)
 
-BATCH_SIZE = 32
+BATCH_SIZE = None  # Images per model call; None autotunes it once per machine and model
+BATCH_SIZE_CACHE = REPO_ROOT / "config" / "batch_sizes.json"
 MODEL_PATH = REPO_ROOT / "models" / "frc_bumper_run" / "weights" / "best.pt"
+LABEL_CACHE_DB = REPO_ROOT / "config" / "label_cache.db"  # Detections the scraper kept for saved frames
+STATE_DB = REPO_ROOT / "config" / "scraper_state.db"  # The scraper's storage budget index
+LABEL_CONF_FLOOR = 0.25  # Boxes below this confidence are left out of the labels
+LABEL_WRITER_THREADS = 4  # Threads writing label files
+WRITE_CONFIDENCES = True  # Also write <stem>.conf beside each label: the confidence of each label line
 
-# Load model
-model = YOLO(MODEL_PATH)
+model = None  # Loaded in label_images() for the selected --backend
 
 def list_unlabeled_images():
-    all_images = sorted([p for p in RAW_DIR.glob("*") if p.suffix.lower() in [".png", ".jpg", ".jpeg"]])
+    """Manifest records of the raw frames that have no label file yet."""
+    manifest = FrameManifest(RAW_DIR)
+    migrate_frames(RAW_DIR, PROCESSED_DIR, STATE_DB, manifest)
     labeled_basenames = {p.stem for p in LABEL_DIR.glob("*.txt")}
-    return [img for img in all_images if img.stem not in labeled_basenames]
-
-def write_yolo_labels(predictions, image_paths):
-    for pred, path in zip(predictions, image_paths):
-        txt_path = LABEL_DIR / (path.stem + ".txt")
-        lines = []
-        if pred.boxes is not None:
-            for box in pred.boxes.data.cpu().numpy():
-                cls, x1, y1, x2, y2, conf = int(box[5]), *box[0:4], box[4]
-                # Convert to YOLO format: class cx cy w h (normalized)
-                w, h = path.stat().st_size, path.stat().st_size
-                cx = (x1 + x2) / 2 / w
-                cy = (y1 + y2) / 2 / h
-                bw = (x2 - x1) / w
-                bh = (y2 - y1) / h
-                lines.append(f"{cls} {cx:.6f} {cy:.6f} {bw:.6f} {bh:.6f}")
-        with open(txt_path, "w") as f:
-            f.write("\n".join(lines))
+    return [record for record in manifest.records() if Path(record.path).stem not in labeled_basenames]
+
+def image_path(record):
+    """The raw frame, or its data/processed copy for frames the scraper captured in greyscale."""
+    raw = RAW_DIR / record.path
+    return raw if raw.exists() else PROCESSED_DIR / record.path
+
+def load_cached_detections(records, backend):
+    """Detections the scraper stored for these frames with the same weights and backend."""
+    if not LABEL_CACHE_DB.exists():
+        return {}
+    cache = LabelCache(LABEL_CACHE_DB)
+    try:
+        return cache.get_many([record.frame_id for record in records], model_key(backend, MODEL_PATH))
+    finally:
+        cache.close()
+
+def _write_label_file(pred, path, conf_floor):
+    """Write one frame's YOLO label file (class cx cy w h); returns (boxes written, boxes under the floor)."""
+    keep = pred.conf >= conf_floor
+    # xywhn is already normalized by the frame's orig_shape, so the box needs no image size here
+    rows = np.column_stack((pred.cls[keep], np.clip(pred.xywhn[keep], 0, 1)))
+    # The sidecar goes first, so a label file never exists without its confidences
+    if WRITE_CONFIDENCES:
+        np.savetxt(LABEL_DIR / (path.stem + ".conf"), pred.conf[keep], fmt="%.4f")
+    np.savetxt(LABEL_DIR / (path.stem + ".txt"), rows, fmt="%d %.6f %.6f %.6f %.6f")
+    kept = int(keep.sum())
+    return kept, len(keep) - kept
+
+def write_yolo_labels(predictions, image_paths, pool, conf_floor=LABEL_CONF_FLOOR):
+    """Write the label files for a batch on ``pool``; returns (boxes written, boxes under the floor)."""
+    counts = list(pool.map(_write_label_file, predictions, image_paths, [conf_floor] * len(image_paths)))
+    return sum(kept for kept, _ in counts), sum(dropped for _, dropped in counts)
+
+def label_images(records, args, pool):
+    """Label ``records``, writing through ``pool``; returns (boxes written, boxes under the floor)."""
+    global model
+    boxes = dropped = 0
+    # Frames the scraper already ran this model on are labeled from its stored boxes
+    cached = load_cached_detections(records, args.backend)
+    if cached:
+        hits = [record for record in records if record.frame_id in cached]
+        boxes, dropped = write_yolo_labels([cached[record.frame_id] for record in hits],
+                                           [image_path(record) for record in hits], pool, args.conf_floor)
+        print(f"♻️ Labeled {len(hits)} images from detections cached while scraping.")
+    images = [image_path(record) for record in records if record.frame_id not in cached]
+    if not images:
+        return boxes, dropped
+
+    model = load_model(args.backend, MODEL_PATH)
+    probe_frames = sample_frames(images)
+    tuner = BatchTuner(lambda imgs: predict_detections(model, imgs), batch_size=BATCH_SIZE,
+                       cache_file=BATCH_SIZE_CACHE, cache_key=cache_key(args.backend, MODEL_PATH, probe_frames[0].shape))
+    tuner.tune(probe_frames)
+
+    i = 0
+    with tqdm(total=len(images), desc="Labeling", unit="image") as pbar:
+        while i < len(images):
+            batch = images[i:i + tuner.batch_size]
+            imgs = [read_frame(p) for p in batch]
+            results = tuner.predict(imgs)
+            kept, under = write_yolo_labels(results, batch, pool, args.conf_floor)
+            boxes += kept
+            dropped += under
+            i += len(batch)
+            pbar.update(len(batch))
+    return boxes, dropped
 
 def main():
-    images = list_unlabeled_images()
-    print(f"🖼️ Found {len(images)} images needing labels.")
+    parser = argparse.ArgumentParser(description="Auto-label raw frames with best.pt.")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch",
+                        help="Inference backend for best.pt (ONNX exports are cached next to the weights)")
+    parser.add_argument("--conf-floor", type=float, default=LABEL_CONF_FLOOR,
+                        help=f"Leave out boxes below this confidence (default: {LABEL_CONF_FLOOR})")
+    args = parser.parse_args()
+
+    records = list_unlabeled_images()
+    print(f"🖼️ Found {len(records)} images needing labels.")
 
-    for i in tqdm(range(0, len(images), BATCH_SIZE), desc="Labeling"):
-        batch = images[i:i + BATCH_SIZE]
-        imgs = [cv2.imread(str(p)) for p in batch]
-        results = model.predict(imgs, verbose=False)
-        write_yolo_labels(results, batch)
+    if not records:
+        print("✅ Labeling complete!")
+        return
 
+    with ThreadPoolExecutor(max_workers=LABEL_WRITER_THREADS, thread_name_prefix="label-writer") as pool:
+        boxes, dropped = label_images(records, args, pool)
+    print(f"🏷️ Wrote {boxes} boxes; left out {dropped} under the {args.conf_floor} confidence floor.")
     print("✅ Labeling complete!")
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+STAGES = ("search", "download", "decode", "inference", "encode", "write")
+
+
+class StageMetrics:
+    """Cumulative per-stage counters: items, busy seconds and bytes.
+
+    Updates are a few additions under a lock, cheap enough to leave on for
+    every frame. Gauges are callables (e.g. a queue's qsize) sampled only
+    when a snapshot is taken.
+    """
+    def __init__(self, stages=STAGES):
+        self._lock = threading.Lock()
+        self._totals = {stage: [0, 0.0, 0] for stage in stages}
+        self._gauges = {}
+
+    def add(self, stage, count=1, seconds=0.0, nbytes=0):
+        with self._lock:
+            totals = self._totals.setdefault(stage, [0, 0.0, 0])
+            totals[0] += count
+            totals[1] += seconds
+            totals[2] += nbytes
+
+    @contextmanager
+    def timer(self, stage, count=1, nbytes=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, count, time.perf_counter() - start, nbytes)
+
+    def set_gauge(self, name, fn):
+        with self._lock:
+            self._gauges[name] = fn
+
+    def remove_gauge(self, name):
+        with self._lock:
+            self._gauges.pop(name, None)
+
+    def totals(self):
+        with self._lock:
+            return {stage: tuple(values) for stage, values in self._totals.items()}
+
+    def gauges(self):
+        with self._lock:
+            gauges = dict(self._gauges)
+        values = {}
+        for name, fn in gauges.items():
+            try:
+                values[name] = fn()
+            except Exception:
+                values[name] = None
+        return values
+
+
+def stage_delta(before, after, elapsed):
+    """Per-stage counts, rates and busy fraction between two totals() calls."""
+    delta = {}
+    for stage, (count, seconds, nbytes) in after.items():
+        count0, seconds0, nbytes0 = before.get(stage, (0, 0.0, 0))
+        if count == count0 and seconds == seconds0:
+            continue
+        delta[stage] = {
+            "count": count - count0,
+            "seconds": round(seconds - seconds0, 4),
+            "bytes": nbytes - nbytes0,
+            "per_sec": round((count - count0) / elapsed, 2) if elapsed > 0 else None,
+            "busy": round((seconds - seconds0) / elapsed, 3) if elapsed > 0 else None,
+        }
+    return delta
+
+
+class MetricsReporter:
+    """Appends JSONL snapshots of a StageMetrics to ``path`` every ``interval`` seconds.
+
+    Each process runs its own reporter; rows carry the process role and pid
+    so several processes can share one file.
+    """
+    def __init__(self, metrics, path, role, interval=30.0):
+        self.metrics = metrics
+        self.path = Path(path)
+        self.role = role
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_totals = metrics.totals()
+        self._last_time = time.monotonic()
+
+    def write(self, row):
+        row = {"ts": round(time.time(), 3), "role": self.role, "pid": os.getpid(), **row}
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(row) + "\n")
+        except OSError as e:
+            logging.error(f"Could not write metrics to {self.path}: {e}")
+
+    def snapshot(self):
+        now = time.monotonic()
+        totals = self.metrics.totals()
+        elapsed = now - self._last_time
+        self.write({"type": "snapshot", "interval": round(elapsed, 3),
+                    "stages": stage_delta(self._last_totals, totals, elapsed),
+                    "queues": self.metrics.gauges()})
+        self._last_totals, self._last_time = totals, now
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.snapshot()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.snapshot()
@@ -0,0 +1,142 @@
+import json
+import math
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_QUERY = "FRC bumper match"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_stats (
+    query TEXT PRIMARY KEY,
+    pulls REAL NOT NULL DEFAULT 0,   -- decayed number of searches
+    reward REAL NOT NULL DEFAULT 0,  -- decayed sum of normalized yields
+    searches INTEGER NOT NULL DEFAULT 0,
+    new_urls INTEGER NOT NULL DEFAULT 0,
+    frames_saved INTEGER NOT NULL DEFAULT 0,
+    last_searched REAL
+);
+CREATE TABLE IF NOT EXISTS query_meta (
+    key TEXT PRIMARY KEY,
+    value REAL
+);
+CREATE TABLE IF NOT EXISTS search_cache (
+    query TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    results TEXT NOT NULL
+);
+"""
+
+
+class QueryScheduler:
+    """Chooses which search query to run next and caches what each search returned.
+
+    Every query is scored by its yield: the frames saved plus
+    ``new_url_weight`` per new URL, divided by the best yield seen so far.
+    Queries are picked with UCB1 over an exponentially decayed average, so
+    productive queries are preferred, fresh ones get tried, and a query
+    that has run dry loses its share as its recent yields drop to zero.
+
+    ``search_fn(query, max_results)`` returns a list of result URLs; its
+    results are cached for ``cache_ttl`` seconds. A query whose cached
+    results are all already seen (per ``is_seen(url)``) is skipped until
+    the cache expires.
+    """
+    def __init__(self, queries_file, db_path, search_fn, is_seen=None, cache_ttl=24 * 3600,
+                 exploration=1.0, decay=0.9, new_url_weight=5.0):
+        self.queries_file = Path(queries_file)
+        self.search_fn = search_fn
+        self.is_seen = is_seen
+        self.cache_ttl = cache_ttl
+        self.exploration = exploration
+        self.decay = decay
+        self.new_url_weight = new_url_weight
+        self._queries = []
+        self._queries_mtime = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    # --- Queries ---
+    def queries(self):
+        """Current queries, re-read only when search_terms.txt changes."""
+        try:
+            mtime = self.queries_file.stat().st_mtime_ns
+        except OSError:
+            return [DEFAULT_QUERY]
+        if mtime != self._queries_mtime:
+            with open(self.queries_file, 'r') as f:
+                self._queries = [line.strip() for line in f if line.strip()]
+            self._queries_mtime = mtime
+        return self._queries or [DEFAULT_QUERY]
+
+    def _cached(self, query):
+        with self._lock:
+            row = self._conn.execute("SELECT fetched_at, results FROM search_cache WHERE query = ?",
+                                     (query,)).fetchone()
+        if row is None or time.time() - row["fetched_at"] > self.cache_ttl:
+            return None
+        return json.loads(row["results"])
+
+    def _exhausted(self, query):
+        cached = self._cached(query)
+        if cached is None or self.is_seen is None:
+            return False
+        return all(self.is_seen(url) for url in cached)
+
+    def next_query(self):
+        queries = self.queries()
+        with self._lock:
+            rows = {row["query"]: row for row in self._conn.execute("SELECT * FROM query_stats")}
+        candidates = [q for q in queries if not self._exhausted(q)] or queries
+
+        total_pulls = sum(rows[q]["pulls"] for q in candidates if q in rows)
+        best_score, best = -1.0, []
+        for query in candidates:
+            row = rows.get(query)
+            if row is None or row["pulls"] <= 0:
+                score = math.inf  # Try every query at least once
+            else:
+                mean = row["reward"] / row["pulls"]
+                score = mean + self.exploration * math.sqrt(math.log(max(total_pulls, 1.0) + 1) / row["pulls"])
+            if score > best_score:
+                best_score, best = score, [query]
+            elif score == best_score:
+                best.append(query)
+        return random.choice(best)
+
+    # --- Searching ---
+    def search(self, query, max_results=10):
+        """Return cached results for ``query`` if still fresh, otherwise search."""
+        cached = self._cached(query)
+        if cached is not None:
+            print(f"🗂️ Using cached results for '{query}'.")
+            return cached[:max_results]
+        results = list(self.search_fn(query, max_results))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO search_cache (query, fetched_at, results) VALUES (?, ?, ?) "
+                "ON CONFLICT(query) DO UPDATE SET fetched_at = excluded.fetched_at, results = excluded.results",
+                (query, time.time(), json.dumps(results)))
+        return results
+
+    def record_yield(self, query, new_urls, frames_saved):
+        """Credit a query with what one of its searches produced."""
+        raw = frames_saved + self.new_url_weight * new_urls
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM query_meta WHERE key = 'best_yield'").fetchone()
+            best_yield = max(row[0] if row else 0.0, raw, 1.0)
+            self._conn.execute(
+                "INSERT INTO query_meta (key, value) VALUES ('best_yield', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (best_yield,))
+            self._conn.execute(
+                "INSERT INTO query_stats (query) VALUES (?) ON CONFLICT(query) DO NOTHING", (query,))
+            self._conn.execute(
+                "UPDATE query_stats SET pulls = pulls * ? + 1, reward = reward * ? + ?, "
+                "searches = searches + 1, new_urls = new_urls + ?, frames_saved = frames_saved + ?, "
+                "last_searched = ? WHERE query = ?",
+                (self.decay, self.decay, raw / best_yield, new_urls, frames_saved, time.time(), query))
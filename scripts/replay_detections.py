@@ -0,0 +1,222 @@
+import argparse
+import csv
+import logging
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+from detection_cache import DetectionCache
+from frame_dedup import HashIndex, dhash
+from inference_backend import BACKENDS, model_key
+from video_store import canonical_url
+
+# Replays a selection policy over the per-video detection logs the scraper
+# keeps with LOG_VIDEO_DETECTIONS = True. Dedup is replayed from the frame
+# hashes in the log (logs written before they were recorded skip it), so a
+# frame counts as missing only if the scraper would save it now.
+TEMP_DIR = Path(__file__).resolve().parent.parent / "temp" / "replay"
+
+
+def select_frames(video, threshold, max_negatives):
+    """Indices (into the video's rows) of the positives at ``threshold``, and of up to ``max_negatives`` negatives."""
+    positive = video.max_conf >= threshold
+    negatives = np.flatnonzero(~positive)
+    if len(negatives) > max_negatives:
+        # Spread the kept negatives over the whole video
+        negatives = negatives[np.linspace(0, len(negatives) - 1, max(0, max_negatives)).round().astype(int)]
+    return np.flatnonzero(positive), negatives
+
+
+def drop_duplicates(video, rows, kept_rows, global_hashes, planned, video_distance, global_distance):
+    """The ``rows`` the scraper's dedup would still save, given the video's ``kept_rows`` already on disk.
+
+    ``planned`` collects the hashes of rows kept so far, so later videos are
+    checked against them as if they were already saved. Everything is kept
+    if the log has no frame hashes or ``global_hashes`` is None (dedup off).
+    """
+    hashes = getattr(video, "frame_hash", None)
+    if hashes is None or global_hashes is None:
+        return list(rows)
+    video_hashes = HashIndex()
+    for row in kept_rows:
+        video_hashes.add(int(hashes[row]))
+    kept = []
+    for row in rows:
+        frame_hash = int(hashes[row])
+        if (video_hashes.contains_near(frame_hash, video_distance)
+                or global_hashes.contains_near(frame_hash, global_distance)
+                or planned.contains_near(frame_hash, global_distance)):
+            continue
+        video_hashes.add(frame_hash)
+        planned.add(frame_hash)
+        kept.append(row)
+    return kept
+
+
+def frames_on_disk(manifest):
+    """{(video_id, frame_index): relative path} for the live frames in the manifest."""
+    on_disk = {}
+    for record in manifest.records():
+        if record.video_id and record.frame_index:
+            on_disk[(record.video_id, int(record.frame_index))] = record.path
+    return on_disk
+
+
+def _read_frames(cap, frame_indices):
+    """Yield (frame_index, frame) for sorted ``frame_indices``, seeking over long gaps."""
+    position = 0
+    for frame_index in frame_indices:
+        if frame_index - position > 30:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            position = frame_index
+        while position < frame_index:
+            if not cap.grab():
+                return
+            position += 1
+        ret, frame = cap.read()
+        if not ret:
+            return
+        position += 1
+        yield frame_index, frame
+
+
+def fetch_missing(scraper, video, rows, threshold, full_size=True):
+    """Download one video again and save the selected frames that aren't on disk. Returns frames saved.
+
+    Boxes go to the label cache only if they came from a full-size pass.
+    """
+    path = scraper.download_video_clip(canonical_url(video.video_id), video.video_id, TEMP_DIR)
+    if path is None:
+        return 0
+    wanted = {int(video.frame_index[row]): row for row in rows}
+    writer = scraper.FrameWriterPool(on_written=scraper._record_saved_frame, on_failed=scraper._release_reservation)
+    video_hashes = HashIndex()
+    cap = cv2.VideoCapture(str(path))
+    try:
+        for frame_index, frame in _read_frames(cap, sorted(wanted)):
+            if scraper.CAPTURE_GREYSCALE:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            # The selection already skipped duplicates if the log had hashes; older logs rely on this
+            frame_hash = dhash(frame) if scraper.DEDUP_ENABLED else None
+            if frame_hash is not None and (video_hashes.contains_near(frame_hash, scraper.DEDUP_VIDEO_DISTANCE) or
+                                           scraper.global_hashes.contains_near(frame_hash,
+                                                                               scraper.DEDUP_GLOBAL_DISTANCE)):
+                continue
+            row = wanted[frame_index]
+            confidence = float(video.max_conf[row])
+            value = confidence if confidence >= threshold else scraper.NEGATIVE_VALUE
+            if not scraper.storage.reserve(value):
+                continue
+            if frame_hash is not None:
+                video_hashes.add(frame_hash)
+                scraper.global_hashes.add(frame_hash)
+            frame_id = scraper.frame_ids.allocate()
+            relpath = scraper.frame_relpath(frame_id, writer.encoder.ext)
+            filepath = scraper.save_dir() / relpath
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            writer.submit(filepath, frame, (frame_id, relpath, value, confidence, video.video_id, frame_index,
+                                            video.detections(row) if full_size and video.inferred[row] else None,
+                                            writer.encoder.spec))
+    finally:
+        cap.release()
+        saved = writer.close()
+        scraper.global_hashes.save()
+        path.unlink(missing_ok=True)
+    return saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-select frames from cached detections at a new threshold.")
+    parser.add_argument("--threshold", type=float, required=True, help="Confidence a frame needs to count as positive")
+    parser.add_argument("--max-negatives", type=int, default=None,
+                        help="Negatives kept per video (default: the scraper's MAX_NEGATIVE_PER_VIDEO)")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch", help="Backend the detections came from")
+    parser.add_argument("--cascade-imgsz", type=int, default=None,
+                        help="Replay logs from a cascade run with this triage size instead of full-size ones")
+    parser.add_argument("--fetch", action="store_true",
+                        help="Re-download videos with selected frames that aren't on disk and save those frames")
+    args = parser.parse_args()
+
+    import scraper
+    scraper.open_state()
+
+    max_negatives = scraper.MAX_NEGATIVE_PER_VIDEO if args.max_negatives is None else args.max_negatives
+    key = model_key(args.backend, scraper.MODEL_PATH)
+    log_key = f"{key}-cascade{args.cascade_imgsz}" if args.cascade_imgsz else key
+    cache = DetectionCache(scraper.DETECTION_CACHE_DIR)
+    video_ids = cache.video_ids(log_key)
+    if not video_ids:
+        print(f"❌ No cached detections for {log_key} in {cache.root}. Scrape with LOG_VIDEO_DETECTIONS = True first.")
+        return
+
+    start = time.perf_counter()
+    replayed = set(video_ids)
+    on_disk = frames_on_disk(scraper.frame_manifest)
+    global_hashes = scraper.global_hashes if scraper.DEDUP_ENABLED else None
+    selected_keys, missing = set(), {}
+    rows_out = []
+    duplicates = 0
+    planned = HashIndex()
+    for video_id in video_ids:
+        video = cache.load(log_key, video_id)
+        positives, negatives = select_frames(video, args.threshold, max_negatives)
+        saved_rows = {row: on_disk[(video_id, int(video.frame_index[row]))] for row in range(len(video))
+                      if (video_id, int(video.frame_index[row])) in on_disk}
+        # Positives have to match frame for frame. The scraper picks its negatives at random, so
+        # those only have to match in number: the ones on disk count, and only a shortfall is fetched.
+        saved_negatives = [row for row in sorted(saved_rows) if video.max_conf[row] < args.threshold][:max_negatives]
+        wanted = [row for row in positives if row not in saved_rows]
+        wanted += [row for row in negatives if row not in saved_rows][:max(0, len(negatives) - len(saved_negatives))]
+        fetch = drop_duplicates(video, sorted(wanted), saved_rows, global_hashes, planned,
+                                scraper.DEDUP_VIDEO_DISTANCE, scraper.DEDUP_GLOBAL_DISTANCE)
+        duplicates += len(wanted) - len(fetch)
+        if fetch:
+            missing[video_id] = (video, fetch)
+        kept = [row for row in positives if row in saved_rows] + saved_negatives
+        for row in sorted(kept + fetch):
+            frame_index = int(video.frame_index[row])
+            selected_keys.add((video_id, frame_index))
+            rows_out.append((video_id, frame_index, f"{video.max_conf[row]:.4f}", saved_rows.get(row, "")))
+    elapsed = time.perf_counter() - start
+
+    unselected = sum(1 for frame_key in on_disk if frame_key[0] in replayed and frame_key not in selected_keys)
+    missing_frames = sum(len(rows) for _, rows in missing.values())
+    print(f"🔁 Replayed {len(video_ids)} videos at threshold {args.threshold} in {elapsed:.2f}s: "
+          f"{len(rows_out)} frames selected, {len(rows_out) - missing_frames} already on disk, "
+          f"{missing_frames} missing from {len(missing)} videos ({duplicates} near-duplicates not counted).")
+    print(f"📦 {unselected} frames on disk from these videos are no longer selected (left in place).")
+
+    scraper.LOGS_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = scraper.LOGS_DIR / f"replay_{args.threshold:g}_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    with open(out_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["video_id", "frame_index", "confidence", "path"])
+        writer.writerows(rows_out)
+    print(f"💾 Saved selection to {out_path}")
+
+    if not args.fetch or not missing:
+        return
+    scraper.storage = scraper.open_storage_budget()
+    scraper.storage.start()
+    if scraper.CACHE_DETECTIONS:
+        scraper.label_cache = scraper.LabelCache(scraper.LABEL_CACHE_DB)
+        scraper.detection_key = key
+    try:
+        for video, rows in missing.values():
+            print(f"🎥 Fetching {len(rows)} frames from {video.video_id}...")
+            try:
+                saved = fetch_missing(scraper, video, rows, args.threshold, full_size=log_key == key)
+            except Exception as e:
+                print(f"❌ Could not fetch frames from {video.video_id}: {e}")
+                logging.error(f"Could not fetch frames from {video.video_id}: {e}")
+                continue
+            print(f"✔️ Saved {saved}/{len(rows)} frames from {video.video_id}.")
+    finally:
+        scraper.storage.close()
+        if scraper.label_cache is not None:
+            scraper.label_cache.close()
+        scraper.frame_ids.close()
+
+
+if __name__ == "__main__":
+    main()
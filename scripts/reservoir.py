@@ -0,0 +1,36 @@
+import random
+
+
+class Reservoir:
+    """Uniform random sample of at most ``k`` items from a stream of unknown length.
+
+    Algorithm R, split in two so callers only pay to build an item when it
+    is kept: offer() counts the next item and returns the slot it should go
+    in (or None to drop it), then put() stores it. Every item seen has the
+    same k/n chance of being in the final sample, wherever it came in the
+    stream. ``seed`` makes the sample repeatable.
+    """
+    def __init__(self, k, seed=None):
+        self.k = k
+        self.seen = 0
+        self._items = [None] * k
+        self._rng = random.Random(seed)
+
+    def offer(self):
+        self.seen += 1
+        if self.seen <= self.k:
+            return self.seen - 1
+        slot = self._rng.randrange(self.seen)
+        return slot if slot < self.k else None
+
+    def put(self, slot, item):
+        self._items[slot] = item
+
+    def items(self):
+        return [item for item in self._items if item is not None]
+
+    def shuffled(self):
+        """The held items in random order, for keeping a random subset of them."""
+        items = self.items()
+        self._rng.shuffle(items)
+        return items
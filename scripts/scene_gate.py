@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+
+
+class SceneChangeGate:
+    """Cheap pre-filter that decides whether a frame needs a model pass.
+
+    Each frame is shrunk to a small greyscale thumbnail and compared against
+    the thumbnail of the last frame that was sent to the model, using both
+    the mean absolute pixel difference and a histogram distance. If neither
+    crosses its threshold the scene hasn't changed and the caller can reuse
+    the previous decision. After ``max_reuse`` consecutive reuses the next
+    frame is always let through so slow drift can't go unchecked forever.
+    """
+    def __init__(self, diff_threshold=6.0, hist_threshold=0.15, max_reuse=10, size=(64, 36)):
+        self.diff_threshold = diff_threshold
+        self.hist_threshold = hist_threshold
+        self.max_reuse = max_reuse
+        self.size = size
+        self._reference = None
+        self._reference_hist = None
+        self._reused = 0
+
+    def _thumbnail(self, frame):
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+
+    def needs_inference(self, frame):
+        """Return True (and make ``frame`` the new reference) if the scene changed."""
+        thumb = self._thumbnail(frame)
+        hist = cv2.calcHist([thumb], [0], None, [32], [0, 256])
+        cv2.normalize(hist, hist)
+
+        if self._reference is not None and self._reused < self.max_reuse:
+            diff = float(np.mean(cv2.absdiff(thumb, self._reference)))
+            hist_distance = cv2.compareHist(self._reference_hist, hist, cv2.HISTCMP_BHATTACHARYYA)
+            if diff < self.diff_threshold and hist_distance < self.hist_threshold:
+                self._reused += 1
+                return False
+
+        self._reference = thumb
+        self._reference_hist = hist
+        self._reused = 0
+        return True
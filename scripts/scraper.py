@@ -1,93 +1,165 @@
-import os
-import json
 import cv2
 import torch
-import csv
 import shutil
-import random
 import time
-from ultralytics import YOLO
 from pathlib import Path
 from yt_dlp import YoutubeDL
 from ddgs import DDGS
 import threading
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
-import subprocess
-import sys
 import logging
-import psutil
+import atexit
+import argparse
+from frame_ids import FrameIdAllocator
+from download_manager import DownloadManager
+from video_stream import PipeCapture
+from frame_dedup import HashIndex, dhash
+from frame_pool import FramePool
+from reservoir import Reservoir
+from frame_codec import FrameEncoder
+from scene_gate import SceneChangeGate
+from inference_backend import BACKENDS, load_model, model_key, predict_detections
+from inference_server import PROBE_FRAME_SHAPE, InferenceClient, serve as serve_inference
+from batch_tuner import BatchTuner, cache_key, sample_frames
+from functools import partial
+from video_store import VideoStore, canonical_url, canonical_video_id
+from worker_pool import RecyclingWorker
+from storage_budget import NEGATIVE_VALUE, StorageBudget
+from frame_store import FrameManifest, frame_relpath, migrate_frames
+from label_cache import LabelCache
+from detection_cache import DetectionCache, VideoDetectionLog
+from cascade import CascadePredictor
+from metrics import MetricsReporter, StageMetrics, stage_delta
+from query_scheduler import QueryScheduler
+import multiprocessing as mp
 
 # --- CONFIG ---
 CONFIDENCE_THRESHOLD = 0.5
-FRAME_SKIP = 10
-SAVE_NEGATIVE_EVERY_N = 30
-MAX_NEGATIVE_PER_VIDEO = 5  # Limit negative frames per video to save space
-MAX_FRAMES = 99_999
-RESTART_AFTER = 10  # Restart after this many videos
-MIN_FREE_SPACE_GB = 2  # Minimum free disk space in GB to continue saving frames
+FRAME_SKIP = 3  # Run inference on every Nth frame
+SAMPLING_MODE = "auto"  # "grab" skipped frames, "seek" past them, or "auto" to choose by stride
+SEEK_MIN_STRIDE = 30  # In auto mode, seek instead of grabbing once FRAME_SKIP reaches this
+MAX_NEGATIVE_PER_VIDEO = 5  # Negative frames kept per video, sampled evenly at random across all of it
+NEGATIVE_OVERSAMPLE = 2    # Hold this many times as many candidates, to replace any that duplicate a later positive
+FRAME_ID_BLOCK = 256  # Frame IDs reserved per write of the counter file
+WORKER_MAX_VIDEOS = 10  # Recycle the worker process after this many videos
+WORKER_MAX_RSS_GB = 6  # ...or as soon as its memory use passes this
+MIN_FREE_SPACE_GB = 2  # Minimum free disk space in GB to keep while saving frames
+RAW_BUDGET_GB = 50     # Saved frames are kept under this by evicting the lowest-value ones
+EVICT_COPIES = False   # Evicting a frame also deletes its data/processed copy and label files (not counted in the budget)
+STORAGE_CHECK_INTERVAL = 5.0  # Seconds between free space samples
+BATCH_SIZE = None         # Frames per model call; None autotunes it once per machine and model
+CLIENT_BATCH_SIZE = 8     # Frames per request to the shared model when --parallel > 1 and BATCH_SIZE is None
+DECODE_QUEUE_SIZE = 32    # Sampled frames buffered between the decoder and the model
+WRITER_THREADS = 4        # Threads encoding saved frames
+FRAME_FORMAT = "png:1"    # "png:<level 0-9>", "jpeg:<quality>" or "webp:<quality, 101 = lossless>"; see frame_codec.py
+WRITE_QUEUE_SIZE = 16     # Saved frames held in memory waiting for a writer
+PREFETCH_VIDEOS = 3       # Videos downloading or downloaded ahead of processing
+MAX_CONCURRENT_DOWNLOADS = 2
+TEMP_DISK_BUDGET_GB = 5   # Stop prefetching while temp/ holds more than this
+DEDUP_ENABLED = True      # Skip saving near-duplicate frames
+DEDUP_VIDEO_DISTANCE = 6  # Max Hamming distance (of 64 bits) to a frame already saved from this video
+DEDUP_GLOBAL_DISTANCE = 3 # Max Hamming distance to any frame saved in earlier runs
+SCENE_GATE_ENABLED = True # Reuse the last decision when the scene hasn't changed
+SCENE_DIFF_THRESHOLD = 6.0   # Mean abs pixel diff (0-255) on a 64x36 grey thumbnail
+SCENE_HIST_THRESHOLD = 0.15  # Bhattacharyya distance between grey histograms
+SCENE_MAX_REUSE = 10      # Force inference after this many reused decisions in a row
+PENDING_FRAMES_PER_BATCH = 8  # Run the model early once this many times the tuned batch size of sampled frames
+                              # are waiting (at most FRAME_POOL_SIZE - 1); 8 still fills batches when the
+                              # scene gate skips 7 frames in 8
+FRAME_POOL_SIZE = 64      # Preallocated frame buffers per video: a hard cap on decoded frames in memory
+CAPTURE_GREYSCALE = False # Convert sampled frames to one channel after decode; infer on them and save them to data/processed
+CASCADE_ENABLED = False   # Triage each batch at CASCADE_TRIAGE_IMGSZ and only re-run uncertain frames at full size
+CASCADE_TRIAGE_IMGSZ = 320
+CASCADE_BAND = (0.25, 0.75)  # Triage confidences in [low, high) are re-run at full size; must contain CONFIDENCE_THRESHOLD
+CASCADE_AUDIT_EVERY = 20  # Also re-run every Nth confident frame at full size to measure agreement; 0 disables
+SEARCH_CACHE_TTL_HOURS = 24  # Reuse a query's search results for this long
+METRICS_INTERVAL = 30     # Seconds between metrics snapshots in logs/eval_reports/scraper_metrics.jsonl
+IDLE_BACKOFF_SECONDS = (5, 300)  # Wait between searches that find nothing new, doubling up to the max
+CACHE_DETECTIONS = True   # Keep the boxes found for saved frames so the labeler can skip re-running the model
+LOG_VIDEO_DETECTIONS = False  # Keep every sampled frame's detections per video, for replay_detections.py
+INGEST_MODE = "download"  # "download" to temp/ mp4 files, or "stream" frames through ffmpeg
+INFERENCE_BACKEND = "pytorch"  # Default for --backend: "pytorch", "onnx" or "onnx-int8"
+PARALLEL_VIDEOS = 1       # Default for --parallel: videos decoded at once, sharing one model
+INFERENCE_MAX_BATCH = None  # Frames the shared model takes per call when --parallel > 1; None autotunes
+INFERENCE_MAX_WAIT_MS = 20  # How long the shared model waits to fill a batch
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = REPO_ROOT / "data" / "raw"
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+LABEL_DIR = REPO_ROOT / "data" / "labels"
+PROCESSED_DIR = REPO_ROOT / "data" / "processed"
 FRAME_INDEX_FILE = REPO_ROOT / "config" / "frame_counter.txt"
+MODEL_PATH = REPO_ROOT / "models" / "frc_bumper_run" / "weights" / "best.pt"
 stop_requested = False
+stop_signal = None  # Multiprocessing event that forwards stop_requested to the worker
 
-URL_LOG = REPO_ROOT / "config" / "seen_urls.json"
+URL_LOG = REPO_ROOT / "config" / "seen_urls.json"  # Legacy, imported into VIDEO_DB once
 LOGS_DIR = REPO_ROOT / "logs" / "eval_reports"
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 FRAME_LOG_CSV = LOGS_DIR / "frame_log.csv"
+METRICS_FILE = LOGS_DIR / "scraper_metrics.jsonl"
+VIDEO_DB = REPO_ROOT / "config" / "scraper_state.db"
+FRAME_HASH_INDEX = REPO_ROOT / "config" / "frame_hashes.npy"
 QUERIES_FILE = REPO_ROOT / "config" / "search_terms.txt"
+BATCH_SIZE_CACHE = REPO_ROOT / "config" / "batch_sizes.json"
+LABEL_CACHE_DB = REPO_ROOT / "config" / "label_cache.db"
+DETECTION_CACHE_DIR = REPO_ROOT / "data" / "detections"
 
 # Setup error logging
 ERROR_LOG_FILE = REPO_ROOT / "logs" / "errors.log"
 logging.basicConfig(filename=ERROR_LOG_FILE, level=logging.ERROR,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-# --- Load Frame Counter ---
-def load_frame_counter():
-    if FRAME_INDEX_FILE.exists():
-        with open(FRAME_INDEX_FILE, "r") as f:
-            return int(f.read().strip())
-    else:
-        existing_frames = sorted(OUTPUT_DIR.glob("frame_*.png"))
-        if existing_frames:
-            return max(int(f.stem.split("_")[1]) for f in existing_frames) + 1
-        return 0
-
-def save_frame_counter(counter):
-    with open(FRAME_INDEX_FILE, "w") as f:
-        f.write(str(counter))
+# --- State ---
+# Opened by open_state(), so importing this module (e.g. from benchmark_pipeline.py) touches no state files
+frame_ids = None  # FrameIdAllocator
+global_hashes = None  # HashIndex of every frame kept
+frame_manifest = None  # data/raw/manifest.csv
+video_store = None  # VideoStore (imports seen_urls.json and the old frame_log.csv once)
+storage = None  # StorageBudget for save_dir(), opened in the worker
+
+def open_state():
+    """Open the frame counter, hash index, manifest and video store, in the main and each worker process."""
+    global frame_ids, global_hashes, frame_manifest, video_store
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    frame_ids = FrameIdAllocator(FRAME_INDEX_FILE, OUTPUT_DIR, block_size=FRAME_ID_BLOCK, mirror_dirs=(PROCESSED_DIR,))
+    atexit.register(frame_ids.close)
+    print(f"📸 Starting from frame {frame_ids.next_id} (cached).")
+    global_hashes = HashIndex(FRAME_HASH_INDEX)
+    frame_manifest = FrameManifest(OUTPUT_DIR)
+    video_store = VideoStore(VIDEO_DB, legacy_urls_json=URL_LOG, legacy_frame_log=FRAME_LOG_CSV)
+
+model = None  # Loaded in main() for the selected --backend
+metrics = StageMetrics()  # Per-stage timers, reported by metrics_reporter in each process
+metrics_reporter = None
+batch_tuner = None  # Chooses the inference batch size; set up with the model
+label_cache = None  # LabelCache for saved frames' detections, opened in the worker
+detection_key = None  # model_key() of the weights and backend producing the detections
+detection_cache = None  # DetectionCache for whole-video detection logs, if LOG_VIDEO_DETECTIONS
+video_log_key = None  # Key the video logs are saved under; marks cascade runs apart from full-size ones
+cascade = None  # CascadePredictor wrapping batch_tuner, if CASCADE_ENABLED
 
-frame_counter = load_frame_counter()
-print(f"📸 Starting from frame {frame_counter} (cached).")
-
-# Load seen URLs
-if URL_LOG.exists():
-    with open(URL_LOG, 'r') as f:
-        seen_urls = set(json.load(f))
-else:
-    seen_urls = set()
-
-model = YOLO(REPO_ROOT / "models" / "frc_bumper_run" / "weights" / "best.pt")
+# --- YouTube Scraper ---
+def ddgs_search(query, max_results=10):
+    with DDGS() as ddgs:
+        return [r['href'] for r in ddgs.text(query + " site:youtube.com", max_results=max_results)]
 
-# --- Load Queries ---
-def get_random_query():
-    if QUERIES_FILE.exists():
-        with open(QUERIES_FILE, 'r') as f:
-            queries = [line.strip() for line in f if line.strip()]
-        return random.choice(queries)
-    return "FRC bumper match"
+def is_seen_url(url):
+    video_id = canonical_video_id(url)
+    return video_id is None or video_store.is_seen(video_id)
 
-# --- YouTube Scraper ---
-def search_youtube_videos(query, max_results=10):
+def search_youtube_videos(query, max_results=10, search_fn=ddgs_search):
     print(f"\n🔍 Searching YouTube videos for: '{query}'")
     found = []
-    with DDGS() as ddgs:
-        for r in ddgs.text(query + " site:youtube.com", max_results=max_results):
-            url = r['href']
-            print(f"🔗 Found URL: {url}")
-            if "youtube.com/watch" in url and url not in seen_urls:
-                found.append(url)
+    found_ids = set()
+    for url in search_fn(query, max_results):
+        print(f"🔗 Found URL: {url}")
+        video_id = canonical_video_id(url)
+        if video_id and video_id not in found_ids and not video_store.is_seen(video_id):
+            found_ids.add(video_id)
+            found.append(url)
     print(f"🔷 Total new URLs found: {len(found)}")
     return found
 
@@ -98,45 +170,14 @@ def check_for_stop():
         while True:
             key = input()
             if key.strip().lower() == 'q':
-                print("\n⏸️ Stop requested. Finishing current video then exiting...")
+                print("\n⏸️ Stop requested. Finishing in-flight frames then exiting...")
                 stop_requested = True
+                if stop_signal is not None:
+                    stop_signal.set()
                 break
     except EOFError:
         pass
 
-# --- Disk space check ---
-def has_enough_space(min_gb=MIN_FREE_SPACE_GB):
-    usage = shutil.disk_usage(str(OUTPUT_DIR))
-    free_gb = usage.free / (1024**3)
-    return free_gb >= min_gb
-
-# --- Restart in new terminal and kill old ---
-def restart_in_new_terminal():
-    python = sys.executable
-    script = sys.argv[0]
-    args = sys.argv[1:]
-
-    ps_command = f'python "{script}" {" ".join(args)}'
-
-    subprocess.Popen([
-        "powershell",
-        "-NoExit",
-        "-Command",
-        ps_command
-    ])
-
-    time.sleep(2)  # Give new terminal time to open
-
-    parent_pid = os.getppid()
-    try:
-        parent = psutil.Process(parent_pid)
-        parent.terminate()
-        print("Old terminal window closed.")
-    except Exception as e:
-        print(f"Failed to close old terminal: {e}")
-
-    sys.exit()
-
 # --- Download Video ---
 def download_video_clip(url, video_id, temp_dir):
     temp_dir.mkdir(parents=True, exist_ok=True)
@@ -165,185 +206,728 @@ def download_video_clip(url, video_id, temp_dir):
             time.sleep(5)
     return None
 
-# --- Frame Extractor & Filter ---
-def extract_and_filter_frames(video_path):
-    global frame_counter
-    cap = cv2.VideoCapture(str(video_path))
-    if not cap.isOpened():
-        print(f"❌ Failed to open video: {video_path}")
-        logging.error(f"Failed to open video: {video_path}")
-        return 0
+def download_tracked(url, video_id, temp_dir):
+    """download_video_clip that records state and timing in the video store."""
+    video_store.mark_downloading(video_id)
+    start = time.perf_counter()
+    path = download_video_clip(url, video_id, temp_dir)
+    elapsed = time.perf_counter() - start
+    if path is None:
+        video_store.mark_failed(video_id, "download failed")
+        metrics.add("download", 0, elapsed)
+    else:
+        video_store.record_download(video_id, elapsed)
+        metrics.add("download", 1, elapsed, path.stat().st_size)
+    return path
 
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    print(f"🎮 Total frames in video: {total_frames}")
+# --- Stream Video ---
+def open_video_stream(url):
+    """Resolve a video's direct stream URL and open it as a PipeCapture.
 
-    saved_negatives = 0
-    saved_this_video = 0
+    Frames are decoded by ffmpeg as the bytes arrive instead of waiting for a
+    full temp/<id>.mp4 download. Returns None if the stream can't be opened.
+    """
+    ydl_opts = {
+        'format': 'bv*[ext=mp4][height<=720]',
+        'quiet': True,
+        'noplaylist': True,
+        'no_warnings': True,
+    }
 
-    BATCH_SIZE = 8            # Tune this to your GPU memory
-    SAVE_BATCH_SIZE = 10      # How many frames to save at once to disk
+    for attempt in range(3):
+        try:
+            with YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False)
+            fps = info.get('fps') or 0.0
+            duration = info.get('duration') or 0
+            return PipeCapture(
+                info['url'],
+                width=info['width'],
+                height=info['height'],
+                fps=fps,
+                frame_count=int(fps * duration),
+                http_headers=info.get('http_headers'),
+            )
+        except Exception as e:
+            logging.error(f"Stream open failed (attempt {attempt+1}/3) for {url}: {e}")
+            print(f"❌ Stream open failed (attempt {attempt+1}/3) for {url}: {e}")
+            time.sleep(5)
+    return None
 
-    frames_batch = []
-    frame_indices = []
-    save_buffer = []
+# --- Frame Pipeline Stages ---
+# Decode, inference and PNG encoding run as separate stages connected by
+# bounded queues, so the model is never waiting on cap.read() or cv2.imwrite().
+_END_OF_STREAM = None
+_STOPPED = "stopped"  # Sent instead of _END_OF_STREAM when a stop request ended decoding early
 
-    with tqdm(total=total_frames, desc="Processing Frames", unit="frame") as pbar:
-        frame_idx = 0
-        while True:
-            ret, frame = cap.read()
+def _put_until_stopped(q, item, stop_event):
+    """Blocking put that gives up once the pipeline is shutting down."""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def save_dir():
+    """Where new frames are written: greyscale captures skip data/raw and go straight to data/processed."""
+    return PROCESSED_DIR if CAPTURE_GREYSCALE else OUTPUT_DIR
+
+def _acquire_until_stopped(pool, stop_event):
+    """Blocking FramePool.acquire that gives up once the pipeline is shutting down."""
+    while not stop_event.is_set():
+        buffer = pool.acquire(timeout=0.1)
+        if buffer is not None:
+            return buffer
+    return None
+
+def _resolve_sampling_mode(cap):
+    """Pick how the decoder skips frames between samples for this capture."""
+    mode = SAMPLING_MODE
+    if mode == "auto":
+        mode = "seek" if FRAME_SKIP >= SEEK_MIN_STRIDE else "grab"
+    if mode == "seek" and (not getattr(cap, "seekable", True) or cap.get(cv2.CAP_PROP_FRAME_COUNT) <= 0):
+        # Pipes and streams without a known length can't be seeked reliably
+        mode = "grab"
+    return mode
+
+def _decode_frames(cap, frame_queue, stop_event, frame_pool):
+    """Decoder stage: queue every FRAME_SKIP-th frame for inference.
+
+    Skipped frames are either grab()bed without the BGR conversion or jumped
+    over entirely with a seek, so only sampled frames are ever retrieved,
+    each into a buffer taken from ``frame_pool``. With CAPTURE_GREYSCALE the
+    frame is read into one reused BGR scratch buffer and converted into the
+    pooled (single-channel) buffer, so nothing downstream sees colour.
+    """
+    stride = max(1, FRAME_SKIP)
+    mode = _resolve_sampling_mode(cap)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_idx = 0
+    decode_seconds = 0.0  # Time since the last sample, including grabbed frames
+    scratch = None  # BGR frame reused for every greyscale read
+    try:
+        while not stop_event.is_set() and not stop_requested:
+            buffer = None
+            if mode == "seek" or frame_idx % stride == 0:
+                # Waiting for a free buffer is backpressure, not decode time
+                buffer = _acquire_until_stopped(frame_pool, stop_event)
+                if buffer is None:
+                    return
+            start = time.perf_counter()
+            if mode == "seek":
+                if frame_idx >= total_frames:
+                    frame_pool.release(buffer)
+                    break
+                if frame_idx > 0 and not cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx):
+                    frame_pool.release(buffer)
+                    break
+                ret, frame = cap.read(scratch if CAPTURE_GREYSCALE else buffer)
+            else:
+                if not cap.grab():
+                    if buffer is not None:
+                        frame_pool.release(buffer)
+                    break
+                if buffer is None:
+                    frame_idx += 1
+                    decode_seconds += time.perf_counter() - start
+                    continue
+                ret, frame = cap.retrieve(scratch if CAPTURE_GREYSCALE else buffer)
             if not ret:
+                frame_pool.release(buffer)
                 break
+            if CAPTURE_GREYSCALE:
+                scratch = frame
+                frame = cv2.cvtColor(scratch, cv2.COLOR_BGR2GRAY, dst=buffer)
+            metrics.add("decode", 1, decode_seconds + time.perf_counter() - start)
+            decode_seconds = 0.0
+            if not _put_until_stopped(frame_queue, (frame_idx, frame), stop_event):
+                return
+            frame_idx += stride if mode == "seek" else 1
+    except Exception as e:
+        print(f"⚠️ Decoder stopped on frame {frame_idx}: {e}")
+        logging.error(f"Decoder stopped on frame {frame_idx}: {e}")
+    _put_until_stopped(frame_queue, _STOPPED if stop_requested else _END_OF_STREAM, stop_event)
+
+class FrameWriterPool:
+    """Writer stage: encodes frames to disk on a small thread pool.
+
+    cv2.imencode releases the GIL while encoding, so a few threads keep
+    compression off the inference thread. Frames are encoded with
+    ``encoder`` (FRAME_FORMAT by default), whose extension the file paths
+    should use. At most ``max_pending`` frames are held in memory; submit()
+    blocks once that many are queued. Each write ends with
+    ``on_written(filepath, size, meta)`` on success or ``on_failed(meta)``
+    otherwise, and the frame is handed to ``release_frame`` (e.g.
+    FramePool.release) once it's encoded.
+    """
+    def __init__(self, workers=WRITER_THREADS, max_pending=WRITE_QUEUE_SIZE, on_written=None, on_failed=None,
+                 release_frame=None, encoder=None):
+        self.encoder = encoder or FrameEncoder(FRAME_FORMAT)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._on_written = on_written
+        self._on_failed = on_failed
+        self._release_frame = release_frame
+        self.written = 0
+        self.pending = 0
+
+    def submit(self, filepath, frame, meta=None, encoded=None):
+        """Queue ``frame`` to be encoded and written; pass ``encoded`` bytes instead to only write them."""
+        self._slots.acquire()
+        with self._lock:
+            self.pending += 1
+        try:
+            self._executor.submit(self._write, filepath, frame, meta, encoded)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+
+    def _write(self, filepath, frame, meta, encoded=None):
+        written = False
+        try:
+            # Encode and write separately so the metrics can tell CPU from disk time
+            if frame is not None:
+                try:
+                    with metrics.timer("encode"):
+                        encoded = self.encoder.encode(frame)
+                finally:
+                    if self._release_frame:
+                        self._release_frame(frame)
+            if encoded is not None:
+                with metrics.timer("write", nbytes=len(encoded)):
+                    with open(filepath, "wb") as f:
+                        f.write(encoded.tobytes())
+                written = True
+                with self._lock:
+                    self.written += 1
+                if self._on_written:
+                    self._on_written(filepath, len(encoded), meta)
+            else:
+                print(f"⚠️ Failed to write frame {filepath.name}")
+                logging.error(f"Failed to write frame {filepath}")
+        except Exception as e:
+            print(f"⚠️ Failed to write frame {filepath.name}: {e}")
+            logging.error(f"Failed to write frame {filepath}: {e}")
+        finally:
+            if not written and self._on_failed:
+                self._on_failed(meta)
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+    def close(self):
+        """Wait for every queued frame to hit disk and return the write count."""
+        self._executor.shutdown(wait=True)
+        return self.written
 
-            # Collect every frame (or skip fewer)
-            # Adjust FRAME_SKIP here or remove for no skipping
-            if frame_idx % 3 == 0:  # Change 1 to your preferred skip count (e.g., 2 or 3)
-                frames_batch.append(frame)
-                frame_indices.append(frame_idx)
+# --- Frame Extractor & Filter ---
+def _new_video_stats():
+    # completed is False when a stop request ended the video before its last frame
+    return {"frames_sampled": 0, "inference_skipped": 0, "frames_saved": 0,
+            "duplicates_in_video": 0, "duplicates_global": 0, "completed": True}
+
+def _predict(frames):
+    """Detections for ``frames`` and, per frame, whether they came from a full-size pass."""
+    if cascade is None:
+        detections = batch_tuner.predict(frames)
+        return detections, [True] * len(detections)
+    return cascade.predict(frames)
+
+def _record_saved_frame(filepath, size, meta):
+    frame_id, relpath, value, confidence, video_id, frame_idx, detections, fmt = meta
+    storage.record(frame_id, relpath, size, value, confidence, video_id, frame_idx)
+    frame_manifest.append(frame_id, relpath, video_id, frame_idx, confidence, fmt)
+    if label_cache is not None and detections is not None:
+        try:
+            label_cache.put(frame_id, detection_key, detections)
+        except Exception as e:
+            logging.error(f"Could not cache detections for frame {frame_id}: {e}")
+
+def _release_reservation(meta):
+    storage.release()
+
+def extract_and_filter_frames(video_path, cap=None, video_id=None):
+    """Run the frame pipeline over one video and return its stats dict.
+
+    With no ``cap`` the downloaded file at ``video_path`` is opened and
+    deleted afterwards; pass an already open capture (e.g. a PipeCapture
+    stream) to read from it instead, in which case ``video_path`` is only
+    used for messages. ``video_id`` is recorded against each saved frame.
+    """
+    owns_file = cap is None
+    if owns_file:
+        cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        print(f"❌ Failed to open video: {video_path}")
+        logging.error(f"Failed to open video: {video_path}")
+        return _new_video_stats()
 
-            if len(frames_batch) == BATCH_SIZE or (frame_idx == total_frames - 1):
-                try:
-                    results = model.predict(frames_batch, verbose=False)
-                except Exception as e:
-                    for fi in frame_indices:
-                        print(f"⚠️ AI prediction failed on frame {fi}: {e}")
-                        logging.error(f"AI prediction failed on frame {fi}: {e}")
-                    frames_batch.clear()
-                    frame_indices.clear()
-                    pbar.update(len(frames_batch))
-                    continue
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    print(f"🎮 Total frames in video: {total_frames}")
 
-                for i, result in enumerate(results):
-                    detections = result.boxes
-                    has_bumper = False
-                    if detections is not None and len(detections) > 0:
-                        has_bumper = any(det.conf >= CONFIDENCE_THRESHOLD for det in detections)
-
-                    save = False
-                    if has_bumper:
-                        save = True
-                    elif saved_negatives % SAVE_NEGATIVE_EVERY_N == 0 and saved_negatives < MAX_NEGATIVE_PER_VIDEO:
-                        save = True
-                        saved_negatives += 1
-
-                    if save:
-                        if frame_counter >= MAX_FRAMES:
-                            print(f"⚠️ Frame counter limit reached ({MAX_FRAMES}). Stopping save.")
-                            cap.release()
-                            # Save any buffered frames
-                            for f, idx in save_buffer:
-                                filename = f"frame_{frame_counter:05}.png"
-                                filepath = OUTPUT_DIR / filename
-                                cv2.imwrite(str(filepath), f)
-                                frame_counter += 1
-                                save_frame_counter(frame_counter)
-                                saved_this_video += 1
-                            return saved_this_video
-
-                        if not has_enough_space():
-                            print(f"⚠️ Low disk space. Stopping frame saving.")
-                            cap.release()
-                            # Save buffered frames
-                            for f, idx in save_buffer:
-                                filename = f"frame_{frame_counter:05}.png"
-                                filepath = OUTPUT_DIR / filename
-                                cv2.imwrite(str(filepath), f)
-                                frame_counter += 1
-                                save_frame_counter(frame_counter)
-                                saved_this_video += 1
-                            return saved_this_video
-
-                        save_buffer.append((frames_batch[i], frame_indices[i]))
-
-                        if len(save_buffer) >= SAVE_BATCH_SIZE:
-                            # Write buffered frames to disk in a batch
-                            for f, idx in save_buffer:
-                                filename = f"frame_{frame_counter:05}.png"
-                                filepath = OUTPUT_DIR / filename
-                                cv2.imwrite(str(filepath), f)
-                                frame_counter += 1
-                                save_frame_counter(frame_counter)
-                                saved_this_video += 1
-                            save_buffer.clear()
-
-                frames_batch.clear()
-                frame_indices.clear()
-
-            frame_idx += 1
-            pbar.update(1)
-
-        # Save any leftover buffered frames
-        for f, idx in save_buffer:
-            filename = f"frame_{frame_counter:05}.png"
-            filepath = OUTPUT_DIR / filename
-            cv2.imwrite(str(filepath), f)
-            frame_counter += 1
-            save_frame_counter(frame_counter)
-            saved_this_video += 1
-        save_buffer.clear()
-
-    cap.release()
+    stats = _new_video_stats()
+    video_hashes = HashIndex()
+
+    stop_event = threading.Event()
+    frame_queue = queue.Queue(maxsize=DECODE_QUEUE_SIZE)
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    # Stay below the pool size, or the filter loop could hold every buffer while waiting for more frames
+    max_pending = min(batch_tuner.batch_size * PENDING_FRAMES_PER_BATCH, FRAME_POOL_SIZE - 1)
+    frame_shape = (height, width) if CAPTURE_GREYSCALE else (height, width, 3)
+    frame_pool = FramePool(FRAME_POOL_SIZE, frame_shape if width and height else None)
+    decoder = threading.Thread(target=_decode_frames, args=(cap, frame_queue, stop_event, frame_pool),
+                               name="frame-decoder", daemon=True)
+    writer = FrameWriterPool(on_written=_record_saved_frame, on_failed=_release_reservation,
+                             release_frame=frame_pool.release)
+    metrics.set_gauge("decode_queue", frame_queue.qsize)
+    metrics.set_gauge("write_queue", lambda: writer.pending)
+    metrics.set_gauge("frame_pool", lambda: frame_pool.in_use)
+    metrics_before, video_start = metrics.totals(), time.monotonic()
+    cascade_before = cascade.stats() if cascade is not None else None
+    decoder.start()
+
+    # Sampled frames waiting on the next model call. Each entry is
+    # (frame_idx, frame, slot): slot indexes infer_frames, or is -1 for a frame
+    # the scene gate matched to the last frame inferred in an earlier batch.
+    pending = []
+    infer_frames = []
+    last_detections = None
+    finished = False
+    detection_log = VideoDetectionLog() if detection_cache is not None and video_id else None
+    budget_skips = 0
+    negatives_saved = 0
+    made_dirs = set()
+    frames_root = save_dir()
+    gate = SceneChangeGate(SCENE_DIFF_THRESHOLD, SCENE_HIST_THRESHOLD, SCENE_MAX_REUSE) if SCENE_GATE_ENABLED else None
+    # Negatives are held back as encoded bytes (not pool buffers) until the video ends, so they can
+    # come from anywhere in it rather than just its start
+    negatives = (Reservoir(MAX_NEGATIVE_PER_VIDEO * NEGATIVE_OVERSAMPLE, seed=video_id or str(video_path))
+                 if MAX_NEGATIVE_PER_VIDEO > 0 else None)
+
+    def is_duplicate(frame_hash, held=(), count=True):
+        """True if the frame is a near-duplicate of one already kept, or of a ``held`` hash.
+
+        With ``count`` the rejection is added to the video's duplicate stats.
+        """
+        if frame_hash is None:
+            return False
+        if video_hashes.contains_near(frame_hash, DEDUP_VIDEO_DISTANCE) or any(
+                bin(frame_hash ^ other).count("1") <= DEDUP_VIDEO_DISTANCE for other in held):
+            if count:
+                stats["duplicates_in_video"] += 1
+            return True
+        if global_hashes.contains_near(frame_hash, DEDUP_GLOBAL_DISTANCE):
+            if count:
+                stats["duplicates_global"] += 1
+            return True
+        return False
+
+    def save_frame(frame_idx, frame, encoded, frame_hash, value, confidence, detections):
+        """Dedup, make room for and submit one frame (or its ``encoded`` bytes); returns whether it was submitted."""
+        nonlocal budget_skips
+        if is_duplicate(frame_hash):
+            return False
+
+        # Make room by evicting lower-value frames; skip this one if it's worth the least
+        if not storage.reserve(value):
+            budget_skips += 1
+            return False
+
+        if frame_hash is not None:
+            video_hashes.add(frame_hash)
+            global_hashes.add(frame_hash)
+
+        frame_id = frame_ids.allocate()
+        relpath = frame_relpath(frame_id, writer.encoder.ext)
+        filepath = frames_root / relpath
+        if relpath.parent not in made_dirs:
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            made_dirs.add(relpath.parent)
+        writer.submit(filepath, frame, (frame_id, relpath, value, confidence, video_id, frame_idx, detections,
+                                        writer.encoder.spec), encoded)
+        return True
+
+    with tqdm(total=total_frames or None, desc="Processing Frames", unit="frame") as pbar:
+        try:
+            while not stop_event.is_set():
+                item = frame_queue.get()
+                end_of_stream = item is _END_OF_STREAM or item is _STOPPED
+                if not end_of_stream:
+                    frame_idx, frame = item
+                    stats["frames_sampled"] += 1
+                    if gate is None or gate.needs_inference(frame):
+                        slot = len(infer_frames)
+                        infer_frames.append(frame)
+                    else:
+                        # Unchanged scene: reuse the decision of the last inferred frame
+                        slot = len(infer_frames) - 1
+                        stats["inference_skipped"] += 1
+                    pending.append((frame_idx, frame, slot))
+                    pbar.update(frame_idx + 1 - pbar.n)
+
+                if pending and (len(infer_frames) >= batch_tuner.batch_size or len(pending) >= max_pending
+                                or end_of_stream):
+                    results, full_res = [], []
+                    if infer_frames:
+                        try:
+                            with metrics.timer("inference", count=len(infer_frames)):
+                                results, full_res = _predict(infer_frames)
+                        except Exception as e:
+                            for fi, _, slot in pending:
+                                if slot >= 0:
+                                    print(f"⚠️ AI prediction failed on frame {fi}: {e}")
+                                    logging.error(f"AI prediction failed on frame {fi}: {e}")
+
+                    submitted = set()
+                    for frame_idx, frame, slot in pending:
+                        if slot >= 0:
+                            if slot >= len(results):
+                                continue
+                            detections = results[slot]
+                        elif last_detections is None:
+                            continue
+                        else:
+                            detections = last_detections
+                        confidence = detections.max_conf
+                        inferred = slot >= 0 and infer_frames[slot] is frame
+                        # Hashed here rather than before saving so replay can redo dedup from the log
+                        frame_hash = dhash(frame) if DEDUP_ENABLED else None
+                        if detection_log is not None:
+                            detection_log.add(frame_idx, detections, inferred, frame_hash)
+                        # Boxes are only kept for frames the model saw at full size, not reused or triage-only ones
+                        kept_detections = detections if inferred and full_res[slot] else None
+
+                        if confidence < CONFIDENCE_THRESHOLD:
+                            if negatives is None:
+                                continue
+                            # Near-duplicates of kept or held frames never take a reservoir slot. Most
+                            # candidates are never saved, so these don't count as skipped duplicates;
+                            # those rejected when the reservoir is written out do.
+                            if is_duplicate(frame_hash, [item[2] for item in negatives.items()], count=False):
+                                continue
+                            # Encode only when the reservoir takes it
+                            reservoir_slot = negatives.offer()
+                            if reservoir_slot is not None:
+                                with metrics.timer("encode"):
+                                    encoded = writer.encoder.encode(frame)
+                                if encoded is not None:
+                                    negatives.put(reservoir_slot, (frame_idx, encoded, frame_hash, confidence,
+                                                                   kept_detections))
+                            continue
+
+                        # Skip near-duplicates of frames already kept, before paying for the encode
+                        if save_frame(frame_idx, frame, None, frame_hash, confidence, confidence, kept_detections):
+                            submitted.add(frame_idx)
+
+                    # Frames not handed to the writer are done with once the batch is decided
+                    for frame_idx, frame, _ in pending:
+                        if frame_idx not in submitted:
+                            frame_pool.release(frame)
+
+                    if infer_frames:
+                        last_detections = results[-1] if len(results) == len(infer_frames) else None
+                    pending.clear()
+                    infer_frames.clear()
+
+                if end_of_stream:
+                    finished = item is _END_OF_STREAM
+                    if finished and pbar.total:
+                        pbar.update(pbar.total - pbar.n)
+                    break
+
+            # Written once every negative has had the same chance of being held. Candidates that
+            # duplicate a positive found after them are dropped and a random other one takes their place.
+            if negatives is not None and negatives.seen:
+                for frame_idx, encoded, frame_hash, confidence, detections in negatives.shuffled():
+                    if negatives_saved >= MAX_NEGATIVE_PER_VIDEO:
+                        break
+                    if save_frame(frame_idx, None, encoded, frame_hash, NEGATIVE_VALUE, confidence, detections):
+                        negatives_saved += 1
+        finally:
+            stop_event.set()
+            decoder.join()
+            cap.release()
+            stats["frames_saved"] = writer.close()
+            global_hashes.save()
+            metrics.remove_gauge("decode_queue")
+            metrics.remove_gauge("write_queue")
+            metrics.remove_gauge("frame_pool")
+
+    stats["completed"] = finished
+    # A partial log would make replay treat the unread rest of the video as empty
+    if detection_log is not None and finished and len(detection_log):
+        try:
+            detection_cache.save(video_log_key, video_id, detection_log)
+        except Exception as e:
+            print(f"⚠️ Could not save detections for {video_id}: {e}")
+            logging.error(f"Could not save detections for {video_id}: {e}")
 
-    try:
-        video_path.unlink()
-    except Exception as e:
-        print(f"⚠️ Could not delete video {video_path}: {e}")
-        logging.error(f"Could not delete video {video_path}: {e}")
+    if owns_file:
+        try:
+            video_path.unlink()
+        except Exception as e:
+            print(f"⚠️ Could not delete video {video_path}: {e}")
+            logging.error(f"Could not delete video {video_path}: {e}")
+
+    duplicates = stats["duplicates_in_video"] + stats["duplicates_global"]
+    skip_ratio = stats["inference_skipped"] / max(1, stats["frames_sampled"])
+    print(f"✔️ Done processing video. Saved {stats['frames_saved']} new frames, skipped {duplicates} near-duplicates.")
+    if negatives is not None and negatives.seen:
+        print(f"🎲 Kept {negatives_saved} negative frames sampled from {negatives.seen} across the video.")
+    print(f"🎞️ Scene gate reused {stats['inference_skipped']}/{stats['frames_sampled']} decisions ({skip_ratio:.0%}).")
+    if budget_skips:
+        print(f"💾 Skipped {budget_skips} frames worth less than everything kept within the storage budget.")
+    if cascade is not None:
+        stats.update({name: value - cascade_before[name] for name, value in cascade.stats().items()})
+        agreement = 1 - stats["cascade_disagreed"] / stats["cascade_audited"] if stats["cascade_audited"] else None
+        print(f"🔬 Cascade re-ran {stats['cascade_refined']}/{stats['cascade_frames']} frames at full size"
+              + (f", {agreement:.1%} agreement on {stats['cascade_audited']} audited frames." if agreement is not None
+                 else "."))
+    if metrics_reporter is not None:
+        elapsed = time.monotonic() - video_start
+        metrics_reporter.write({"type": "video", "video_id": video_id, "seconds": round(elapsed, 3), **stats,
+                                "stages": stage_delta(metrics_before, metrics.totals(), elapsed)})
+    return stats
+
+
+# --- Worker Process ---
+# Videos are processed in a child process that RecyclingWorker replaces
+# every WORKER_MAX_VIDEOS videos or when its RSS passes WORKER_MAX_RSS_GB.
+# Search, downloads and the video store stay in the supervisor.
+def _watch_stop_signal(signal):
+    global stop_requested
+    signal.wait()
+    stop_requested = True
 
-    print(f"✔️ Done processing video. Saved {saved_this_video} new frames.")
-    return saved_this_video
+def _watch_inference_server(server):
+    """Stop the scraper if the inference server exits while it is still needed."""
+    global stop_requested
+    server.join()
+    if stop_requested:
+        return
+    print(f"❌ Inference server exited with code {server.exitcode}. Stopping.")
+    logging.error(f"Inference server exited with code {server.exitcode}")
+    stop_requested = True
+    stop_signal.set()
+
+def open_storage_budget():
+    # Greyscale captures have no data/raw copy, so the budget covers the folder frames are saved to
+    mirror = OUTPUT_DIR if CAPTURE_GREYSCALE else PROCESSED_DIR
+    return StorageBudget(save_dir(), VIDEO_DB, int(RAW_BUDGET_GB * 1024**3),
+                         min_free_bytes=int(MIN_FREE_SPACE_GB * 1024**3), label_dir=LABEL_DIR,
+                         check_interval=STORAGE_CHECK_INTERVAL, manifest=frame_manifest,
+                         mirror_dirs=(mirror,), evict_copies=EVICT_COPIES)
+
+def init_worker(backend, signal, client=None):
+    """Load the model, or with an InferenceClient use the shared inference server."""
+    global model, stop_signal, batch_tuner, storage, metrics_reporter, label_cache, detection_key, detection_cache
+    global video_log_key, cascade
+    open_state()
+    stop_signal = signal
+    threading.Thread(target=_watch_stop_signal, args=(signal,), daemon=True).start()
+    storage = open_storage_budget()
+    storage.start()
+    # The inference server runs the same backend and weights, so the key holds for clients too
+    detection_key = model_key(backend, MODEL_PATH)
+    video_log_key = f"{detection_key}-cascade{CASCADE_TRIAGE_IMGSZ}" if CASCADE_ENABLED else detection_key
+    if CACHE_DETECTIONS:
+        label_cache = LabelCache(LABEL_CACHE_DB)
+    if LOG_VIDEO_DETECTIONS:
+        detection_cache = DetectionCache(DETECTION_CACHE_DIR)
+    metrics_reporter = MetricsReporter(metrics, METRICS_FILE, "worker", METRICS_INTERVAL)
+    metrics_reporter.start()
+    if client is not None:
+        # The inference server does the real batching, so requests just need to be small
+        model = client
+        batch_tuner = BatchTuner(partial(predict_detections, model), batch_size=BATCH_SIZE or CLIENT_BATCH_SIZE)
+    else:
+        model = load_model(backend, MODEL_PATH)
+        batch_tuner = BatchTuner(partial(predict_detections, model), batch_size=BATCH_SIZE, cache_file=BATCH_SIZE_CACHE,
+                                 cache_key=cache_key(backend, MODEL_PATH, PROBE_FRAME_SHAPE))
+        batch_tuner.tune(sample_frames(shape=PROBE_FRAME_SHAPE))
+    if CASCADE_ENABLED:
+        cascade = CascadePredictor(batch_tuner.predict, CONFIDENCE_THRESHOLD, CASCADE_BAND, CASCADE_TRIAGE_IMGSZ,
+                                   CASCADE_AUDIT_EVERY)
+
+def process_video_job(url, video_path):
+    """Worker job: process one downloaded file, or stream the URL if no file is given."""
+    if video_path is None:
+        cap = open_video_stream(url)
+        if cap is None:
+            return None
+        return extract_and_filter_frames(url, cap=cap, video_id=canonical_video_id(url))
+    return extract_and_filter_frames(Path(video_path), video_id=canonical_video_id(url))
+
+def shutdown_worker():
+    frame_ids.close()
+    global_hashes.save()
+    if metrics_reporter is not None:
+        metrics_reporter.stop()
+    if storage is not None:
+        storage.close()
+    if label_cache is not None:
+        label_cache.close()
 
 
 # --- Main Loop ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape FRC match videos for bumper frames.")
+    parser.add_argument("--backend", choices=BACKENDS, default=INFERENCE_BACKEND,
+                        help="Inference backend for best.pt (ONNX exports are cached next to the weights)")
+    parser.add_argument("--parallel", type=int, default=PARALLEL_VIDEOS,
+                        help="Videos to process at once; above 1 they share one batching inference process")
+    return parser.parse_args()
+
+def process_video(workers, url, video_id, video_path):
+    """Run one video on an idle worker and record the outcome; returns frames saved."""
+    worker = workers.get()
+    start = time.perf_counter()
+    try:
+        stats = worker.run(url, video_path)
+    except RuntimeError as e:
+        print(f"❌ Worker failed while processing {url}.")
+        logging.error(f"Worker failed while processing {url}: {e}")
+        video_store.mark_failed(video_id, e)
+        return 0
+    finally:
+        workers.put(worker)
+    if stats is None:
+        print(f"⚠️ Skipping video: could not open stream.")
+        video_store.mark_failed(video_id, "stream open failed")
+        return 0
+    if not stats["completed"]:
+        print(f"⏸️ Stopped partway through {url}; it will be processed again next run.")
+        video_store.mark_interrupted(video_id)
+        return stats["frames_saved"]
+    video_store.mark_processed(video_id, stats, time.perf_counter() - start)
+    return stats["frames_saved"]
+
 def main():
+    global stop_signal, metrics_reporter
+    args = parse_args()
+    ctx = mp.get_context("spawn")
+    stop_signal = ctx.Event()
+    open_state()
+    video_store.recover_interrupted()
+
+    # Frames saved before the sharded layout are moved into it once
+    migrate_frames(OUTPUT_DIR, PROCESSED_DIR, VIDEO_DB, frame_manifest)
+
     threading.Thread(target=check_for_stop, daemon=True).start()
 
+    # With --parallel N, N worker processes decode videos side by side and
+    # send their frames to a single inference process, which batches them
+    # into one model call instead of holding N copies of the model.
+    parallel = max(1, args.parallel)
+    server = None
+    clients = [None] * parallel
+    if parallel > 1:
+        inference_requests = ctx.Queue()
+        inference_responses = [ctx.Queue() for _ in range(parallel)]
+        server = ctx.Process(
+            target=serve_inference,
+            args=(args.backend, MODEL_PATH, inference_requests, inference_responses,
+                  INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS / 1000, BATCH_SIZE_CACHE),
+            daemon=True,
+        )
+        server.start()
+        threading.Thread(target=_watch_inference_server, args=(server,), daemon=True).start()
+        clients = [InferenceClient(i, inference_requests, inference_responses[i], server_pid=server.pid)
+                   for i in range(parallel)]
+
+    workers = queue.Queue()
+    for client in clients:
+        workers.put(RecyclingWorker(
+            init_worker, process_video_job,
+            init_args=(args.backend, stop_signal, client),
+            shutdown_fn=shutdown_worker,
+            max_jobs=WORKER_MAX_VIDEOS,
+            max_rss_bytes=int(WORKER_MAX_RSS_GB * 1024**3),
+        ))
+    executor = ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="video")
+    free_slots = threading.BoundedSemaphore(parallel)
+    scheduler = QueryScheduler(QUERIES_FILE, VIDEO_DB, ddgs_search, is_seen=is_seen_url,
+                               cache_ttl=SEARCH_CACHE_TTL_HOURS * 3600)
     temp_dir = REPO_ROOT / "temp"
-    runs_done = 0
-
+    downloads = DownloadManager(
+        temp_dir, download_tracked,
+        prefetch=PREFETCH_VIDEOS,
+        max_concurrent=MAX_CONCURRENT_DOWNLOADS,
+        disk_budget_bytes=int(TEMP_DISK_BUDGET_GB * 1024**3),
+    )
+
+    metrics_reporter = MetricsReporter(metrics, METRICS_FILE, "supervisor", METRICS_INTERVAL)
+    metrics.set_gauge("downloads", downloads.depths)
+    metrics_reporter.start()
+
+    idle_rounds = 0
     while True:
-        query = get_random_query()
-        new_urls = search_youtube_videos(query=query, max_results=30)
-
-        frame_log_rows = []
-        videos_processed = 0
+        query = scheduler.next_query()
+        with metrics.timer("search"):
+            new_urls = search_youtube_videos(query=query, max_results=30, search_fn=scheduler.search)
+        if new_urls:
+            idle_rounds = 0
+        else:
+            # Every cached query can be exhausted at once; don't spin on the cache
+            idle_rounds += 1
+            base, cap = IDLE_BACKOFF_SECONDS
+            deadline = time.monotonic() + min(cap, base * 2 ** (idle_rounds - 1))
+            while not stop_requested and time.monotonic() < deadline:
+                time.sleep(0.5)
+
+        stream_urls = deque()
         for url in new_urls:
+            video_id = canonical_video_id(url)
+            url = canonical_url(video_id)
+            video_store.mark_queued(video_id, url)
+            if INGEST_MODE == "stream":
+                stream_urls.append((url, video_id))
+            else:
+                downloads.add(url, video_id)
+
+        jobs = []
+        while True:
+            # Only take the next video once a worker is free for it
+            free_slots.acquire()
             if stop_requested:
+                free_slots.release()
                 print("Stopping as requested. Exiting main loop.")
+                downloads.close()
                 break
 
-            print(f"\n🎥 Processing: {url}")
-            seen_urls.add(url)
-
-            video_id = url.split("v=")[-1].split("&")[0]
-            downloaded_path = download_video_clip(url, video_id, temp_dir)
-
-            if downloaded_path is None or not downloaded_path.exists():
-
-                print(f"⚠️ Skipping video due to download failure.")
-                continue
-
-            saved_count = extract_and_filter_frames(downloaded_path)
-            frame_log_rows.append([video_id, url, saved_count])
-            videos_processed += 1
-            runs_done += 1
-
-            # Random delay 2-5 seconds between videos to reduce throttling risk
-            time.sleep(random.uniform(2, 5))
-
-            if runs_done >= RESTART_AFTER:
-                print("🔄 Restart limit reached. Restarting script in new terminal...")
-                if temp_dir.exists():
-                    shutil.rmtree(temp_dir)
-                restart_in_new_terminal()
+            if INGEST_MODE == "stream":
+                if not stream_urls:
+                    free_slots.release()
+                    break
+                url, video_id = stream_urls.popleft()
+                print(f"\n🎥 Processing: {url}")
+                video_path = None
+            else:
+                finished = downloads.next_ready()
+                if finished is None:
+                    free_slots.release()
+                    break
+                url, video_id, downloaded_path = finished
+
+                print(f"\n🎥 Processing: {url}")
+                if downloaded_path is None or not downloaded_path.exists():
+                    free_slots.release()
+                    print(f"⚠️ Skipping video due to download failure.")
+                    continue
+                video_path = str(downloaded_path)
 
-        with open(URL_LOG, 'w') as f:
-            json.dump(sorted(list(seen_urls)), f, indent=2)
+            job = executor.submit(process_video, workers, url, video_id, video_path)
+            job.add_done_callback(lambda _: free_slots.release())
+            jobs.append(job)
 
-        with open(FRAME_LOG_CSV, 'a', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            if csvfile.tell() == 0:
-                writer.writerow(['video_id', 'url', 'frames_saved'])
-            writer.writerows(frame_log_rows)
+        frames_from_query = sum(job.result() for job in jobs)
+        scheduler.record_yield(query, len(new_urls), frames_from_query)
+        video_store.export_frame_log(FRAME_LOG_CSV)
 
         if temp_dir.exists():
             try:
@@ -357,6 +941,13 @@ def main():
             print("\n✅ Stopped by user request.")
             break
 
+    executor.shutdown(wait=True)
+    metrics_reporter.stop()
+    while not workers.empty():
+        workers.get().close()
+    if server is not None:
+        inference_requests.put(None)
+        server.join(timeout=60)
     print("\n✅ Done scraping and extracting!")
 
 if __name__ == "__main__":
@@ -0,0 +1,219 @@
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+LEGACY_VALUE = 0.5  # Value given to frames saved before the index existed
+NEGATIVE_VALUE = 0.0  # Negatives are evicted before any positive
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    frame_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,       -- relative to the frames root
+    bytes INTEGER NOT NULL,
+    value REAL NOT NULL,      -- eviction order: lowest value goes first
+    confidence REAL,          -- max detection confidence, NULL if unknown
+    video_id TEXT,
+    frame_index INTEGER,
+    saved_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frames_by_value ON frames (value, saved_at);
+CREATE TABLE IF NOT EXISTS storage_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+
+class StorageMonitor:
+    """Samples free disk space on a background thread.
+
+    ``has_space`` is a cached flag, so checking it before every frame costs
+    nothing; call refresh() after freeing space to update it immediately.
+    """
+    def __init__(self, path, min_free_bytes, interval=5.0):
+        self.path = Path(path)
+        self.min_free_bytes = min_free_bytes
+        self.interval = interval
+        self.free_bytes = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.refresh()
+
+    def refresh(self):
+        try:
+            self.free_bytes = shutil.disk_usage(str(self.path)).free
+        except OSError as e:
+            logging.error(f"Could not check free space on {self.path}: {e}")
+        return self.free_bytes
+
+    @property
+    def has_space(self):
+        return self.free_bytes is None or self.free_bytes >= self.min_free_bytes
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="storage-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class StorageBudget:
+    """Keeps ``frames_dir`` within a byte budget by evicting the least valuable frames.
+
+    Every saved frame is recorded in a ``frames`` table with its size and a
+    value (its detection confidence for positives, NEGATIVE_VALUE for
+    negatives). Before a frame is saved, reserve() checks the running total
+    against ``budget_bytes`` and the monitored free space. If there is no
+    room it evicts lower-value frames (lowest value, then oldest first). If
+    the cheaper frames can't free enough, nothing is evicted and it tells
+    the caller to skip the frame.
+
+    The table lives in the scraper's SQLite database, so several worker
+    processes can share one budget. Only files under ``frames_dir`` count
+    toward it, so by default only those are deleted. With ``evict_copies``
+    an evicted frame's copy at the same relative path in each of
+    ``mirror_dirs`` and its label and confidence files in ``label_dir`` go
+    too. Evictions are recorded in ``manifest`` (a FrameManifest), if one is
+    given, unless a mirror copy is left behind for the tools that read it.
+    """
+    def __init__(self, frames_dir, db_path, budget_bytes, min_free_bytes=0, label_dir=None,
+                 check_interval=5.0, evict_chunk_bytes=None, manifest=None, mirror_dirs=(), evict_copies=False):
+        self.frames_dir = Path(frames_dir)
+        self.mirror_dirs = [Path(d) for d in mirror_dirs]
+        self.evict_copies = evict_copies
+        self.manifest = manifest
+        self.label_dir = Path(label_dir) if label_dir else None
+        self.budget_bytes = budget_bytes
+        # Evict a little more than needed so we aren't evicting on every frame
+        self.evict_chunk_bytes = evict_chunk_bytes if evict_chunk_bytes is not None else budget_bytes // 100
+        self.monitor = StorageMonitor(self.frames_dir, min_free_bytes, check_interval)
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._pending_bytes = 0  # Reserved by this process but not yet written
+        self._average_size = 0  # Running estimate of a saved frame's size
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        self._index_existing()
+        with self._lock:
+            average = self._conn.execute("SELECT AVG(bytes) FROM frames").fetchone()[0]
+        self._average_size = int(average or 0)
+
+    def _index_existing(self):
+        """Index frames saved before this table existed, once."""
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM storage_meta WHERE key = 'total_bytes'").fetchone():
+                return
+            total, now = 0, time.time()
+            for record in (self.manifest.records() if self.manifest else []):
+                try:
+                    size = (self.frames_dir / record.path).stat().st_size
+                except OSError:
+                    continue
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO frames (frame_id, path, bytes, value, saved_at) VALUES (?, ?, ?, ?, ?)",
+                    (record.frame_id, record.path, size, LEGACY_VALUE, now))
+                total += size
+            self._conn.execute("INSERT INTO storage_meta (key, value) VALUES ('total_bytes', ?)", (total,))
+
+    def start(self):
+        self.monitor.start()
+
+    def close(self):
+        self.monitor.stop()
+        with self._lock:
+            self._conn.close()
+
+    def total_bytes(self):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM storage_meta WHERE key = 'total_bytes'").fetchone()
+        return row[0] if row else 0
+
+    def reserve(self, value):
+        """Return True if a frame of ``value`` may be saved, evicting cheaper frames to make room."""
+        needed = self._average_size
+        over_budget = self.total_bytes() + self._pending_bytes + needed - self.budget_bytes
+        if not self.monitor.has_space:
+            over_budget = max(over_budget, self.monitor.min_free_bytes - self.monitor.free_bytes + needed)
+        if over_budget > 0:
+            if not self._evict(over_budget + self.evict_chunk_bytes, value, over_budget):
+                return False
+            self.monitor.refresh()
+        with self._lock:
+            self._pending_bytes += needed
+        return True
+
+    def record(self, frame_id, path, size, value, confidence=None, video_id=None, frame_index=None):
+        """Add a written frame, at ``path`` relative to the frames root, to the index."""
+        with self._lock, self._conn:
+            self._pending_bytes = max(0, self._pending_bytes - self._average_size)
+            self._average_size = int(0.9 * self._average_size + 0.1 * size) if self._average_size else size
+            self._conn.execute(
+                "INSERT OR REPLACE INTO frames (frame_id, path, bytes, value, confidence, video_id, frame_index, saved_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (frame_id, Path(path).as_posix(), size, value, confidence, video_id, frame_index, time.time()))
+            self._conn.execute("UPDATE storage_meta SET value = value + ? WHERE key = 'total_bytes'", (size,))
+
+    def relocate(self, moves):
+        """Update indexed paths after frames were moved, given (frame_id, new relative path)."""
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE frames SET path = ? WHERE frame_id = ?",
+                                   [(Path(path).as_posix(), frame_id) for frame_id, path in moves])
+
+    def release(self):
+        """Give back a reservation whose frame was never written."""
+        with self._lock:
+            self._pending_bytes = max(0, self._pending_bytes - self._average_size)
+
+    def _evict(self, target_bytes, below_value, required_bytes):
+        """Delete frames worth less than ``below_value`` until ``target_bytes`` are freed.
+
+        If those frames add up to less than ``required_bytes``, nothing is
+        deleted, since evicting them would not make room anyway. Returns the
+        bytes freed.
+        """
+        with self._lock, self._conn:
+            # Take the write lock before choosing victims, so two workers can't both evict (and
+            # subtract) the same frames
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT frame_id, path, bytes FROM frames WHERE value < ? ORDER BY value, saved_at",
+                (below_value,))
+            victims, freed = [], 0
+            for row in rows:
+                if freed >= target_bytes:
+                    break
+                victims.append(row)
+                freed += row["bytes"]
+            if freed < required_bytes:
+                return 0
+            self._conn.executemany("DELETE FROM frames WHERE frame_id = ?", [(row["frame_id"],) for row in victims])
+            self._conn.execute("UPDATE storage_meta SET value = value - ? WHERE key = 'total_bytes'", (freed,))
+        if self.manifest and victims:
+            # A frame whose data/processed copy is kept stays in the manifest, which lists those copies too
+            self.manifest.mark_evicted([row["frame_id"] for row in victims if self.evict_copies
+                                        or not any((mirror / row["path"]).exists() for mirror in self.mirror_dirs)])
+        for row in victims:
+            path = self.frames_dir / row["path"]
+            path.unlink(missing_ok=True)
+            if self.evict_copies:
+                for mirror in self.mirror_dirs:
+                    (mirror / row["path"]).unlink(missing_ok=True)
+                if self.label_dir:
+                    (self.label_dir / (path.stem + ".txt")).unlink(missing_ok=True)
+                    (self.label_dir / (path.stem + ".conf")).unlink(missing_ok=True)  # The labeler's confidence sidecar
+        if victims:
+            self.evicted += len(victims)
+            print(f"🗑️ Evicted {len(victims)} low-value frames ({freed / 1024**2:.0f} MB) to stay within the storage budget.")
+        return freed
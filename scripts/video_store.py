@@ -0,0 +1,202 @@
+import csv
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+MAX_RETRIES = 3  # Failed videos are retried until they have failed this many times
+
+FRAME_LOG_COLUMNS = ['video_id', 'url', 'frames_saved', 'duplicates_in_video', 'duplicates_global',
+                     'frames_sampled', 'inference_skipped']
+STAT_COLUMNS = FRAME_LOG_COLUMNS[2:]
+
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    state TEXT NOT NULL,  -- queued, downloading, processed, failed
+    retries INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    frames_saved INTEGER,
+    duplicates_in_video INTEGER,
+    duplicates_global INTEGER,
+    frames_sampled INTEGER,
+    inference_skipped INTEGER,
+    download_seconds REAL,
+    process_seconds REAL,
+    first_seen REAL NOT NULL,
+    processed_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE VIEW IF NOT EXISTS frame_log AS
+    SELECT video_id, url, frames_saved, duplicates_in_video, duplicates_global,
+           frames_sampled, inference_skipped
+    FROM videos WHERE state = 'processed' AND frames_saved IS NOT NULL
+    ORDER BY processed_at, rowid;
+"""
+
+
+def canonical_video_id(url):
+    """Extract the 11-character YouTube video ID so URL variants collapse to one key."""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower().split(":")[0]
+    candidate = None
+    if host.endswith("youtu.be"):
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif "youtube" in host:
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+                candidate = parts[1]
+    if candidate and _VIDEO_ID_RE.match(candidate):
+        return candidate
+    return None
+
+
+def canonical_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+class VideoStore:
+    """Transactional record of every video the scraper has seen.
+
+    Each state change commits immediately, so a crash mid-batch loses at
+    most the video in progress. Call recover_interrupted() once at startup
+    to release videos a crashed run left queued or downloading.
+    """
+    def __init__(self, db_path, legacy_urls_json=None, legacy_frame_log=None):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        if legacy_frame_log:
+            self._import_frame_log(Path(legacy_frame_log))
+        if legacy_urls_json:
+            self._import_seen_urls(Path(legacy_urls_json))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Legacy import ---
+    def _import_once(self, key, rows_fn):
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+            rows = rows_fn()
+            now = time.time()
+            for video_id, url, stats in rows:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO videos (video_id, url, state, first_seen, processed_at, updated_at) "
+                    "VALUES (?, ?, 'processed', ?, ?, ?)", (video_id, url, now, now, now))
+                if stats:
+                    assignments = ", ".join(f"{col} = ?" for col in stats)
+                    self._conn.execute(f"UPDATE videos SET {assignments} WHERE video_id = ?",
+                                       (*stats.values(), video_id))
+            self._conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(len(rows))))
+            return len(rows)
+
+    def _import_seen_urls(self, path):
+        def rows():
+            if not path.exists():
+                return []
+            with open(path, 'r') as f:
+                urls = json.load(f)
+            return [(vid, canonical_url(vid), None) for vid in map(canonical_video_id, urls) if vid]
+        imported = self._import_once(f"imported:{path.name}", rows)
+        if imported:
+            print(f"🗃️ Imported {imported} seen URLs from {path.name}.")
+
+    def _import_frame_log(self, path):
+        def rows():
+            if not path.exists():
+                return []
+            result = []
+            with open(path, 'r', newline='') as f:
+                for row in csv.DictReader(f):
+                    vid = canonical_video_id(row.get('url') or '') or row.get('video_id')
+                    if not vid:
+                        continue
+                    stats = {col: int(row[col]) for col in STAT_COLUMNS if (row.get(col) or '').isdigit()}
+                    result.append((vid, canonical_url(vid), stats))
+            return result
+        self._import_once(f"imported:{path.name}", rows)
+
+    # --- State ---
+    def recover_interrupted(self):
+        """Mark videos left queued/downloading as failed, without spending a retry."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE videos SET state = 'failed', error = 'interrupted', updated_at = ? "
+                "WHERE state IN ('queued', 'downloading')", (time.time(),))
+
+    def is_seen(self, video_id):
+        """True unless the video is new or a failure that still has retries left."""
+        with self._lock:
+            row = self._conn.execute("SELECT state, retries FROM videos WHERE video_id = ?",
+                                     (video_id,)).fetchone()
+        if row is None:
+            return False
+        return row["state"] != "failed" or row["retries"] >= MAX_RETRIES
+
+    def _set(self, video_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{col} = ?" for col in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE videos SET {assignments} WHERE video_id = ?",
+                               (*fields.values(), video_id))
+
+    def mark_queued(self, video_id, url):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO videos (video_id, url, state, first_seen, updated_at) VALUES (?, ?, 'queued', ?, ?) "
+                "ON CONFLICT(video_id) DO UPDATE SET state = 'queued', error = NULL, updated_at = excluded.updated_at",
+                (video_id, url, now, now))
+
+    def mark_downloading(self, video_id):
+        self._set(video_id, state="downloading")
+
+    def record_download(self, video_id, seconds):
+        self._set(video_id, download_seconds=seconds)
+
+    def mark_processed(self, video_id, stats, process_seconds):
+        values = {col: stats.get(col, 0) for col in STAT_COLUMNS}
+        self._set(video_id, state="processed", error=None, process_seconds=process_seconds,
+                  processed_at=time.time(), **values)
+
+    def mark_interrupted(self, video_id):
+        """Mark a video stopped partway through as failed, without spending a retry, so it runs again."""
+        self._set(video_id, state="failed", error="interrupted")
+
+    def mark_failed(self, video_id, error):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE videos SET state = 'failed', error = ?, retries = retries + 1, updated_at = ? "
+                "WHERE video_id = ?", (str(error), time.time(), video_id))
+
+    # --- Reporting ---
+    def export_frame_log(self, csv_path):
+        """Rewrite frame_log.csv from the frame_log view."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM frame_log").fetchall()
+        tmp_path = Path(csv_path).with_suffix(".csv.tmp")
+        with open(tmp_path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(FRAME_LOG_COLUMNS)
+            writer.writerows(tuple(row) for row in rows)
+        tmp_path.replace(csv_path)
@@ -0,0 +1,118 @@
+import subprocess
+import cv2
+import numpy as np
+
+FFMPEG = "ffmpeg"
+
+
+def probe_video(path):
+    """Read width, height, fps and frame count from a local file's header."""
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if not cap.isOpened():
+            return None
+        return {
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        }
+    finally:
+        cap.release()
+
+
+class PipeCapture:
+    """cv2.VideoCapture look-alike that decodes through an ffmpeg pipe.
+
+    ``source`` is anything ffmpeg can open: a remote stream URL or a local
+    file. Frames arrive as raw BGR on ffmpeg's stdout, so decoding starts as
+    soon as the first bytes of the source are available and nothing is
+    written to disk. Only sequential reads are supported; ``seekable`` is
+    False and set() always fails.
+    """
+    seekable = False
+
+    def __init__(self, source, width=None, height=None, fps=0.0, frame_count=0, http_headers=None):
+        if width is None or height is None:
+            info = probe_video(source)
+            if info is None:
+                raise ValueError(f"Could not read video dimensions from {source}")
+            width, height = info["width"], info["height"]
+            fps = fps or info["fps"]
+            frame_count = frame_count or info["frame_count"]
+
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = float(fps or 0.0)
+        self.frame_count = int(frame_count or 0)
+        self.position = 0
+
+        self._frame_bytes = self.width * self.height * 3
+        self._buffer = bytearray(self._frame_bytes)
+        self._has_frame = False
+
+        cmd = [FFMPEG, "-nostdin", "-loglevel", "error"]
+        if http_headers:
+            cmd += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in http_headers.items())]
+        cmd += ["-i", str(source), "-an", "-sn", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                      bufsize=self._frame_bytes)
+
+    def isOpened(self):
+        return self._proc is not None
+
+    def grab(self):
+        """Pull the next frame off the pipe into the internal buffer."""
+        self._has_frame = False
+        if self._proc is None:
+            return False
+        view = memoryview(self._buffer)
+        filled = 0
+        while filled < self._frame_bytes:
+            n = self._proc.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        self._has_frame = True
+        self.position += 1
+        return True
+
+    def retrieve(self, image=None):
+        if not self._has_frame:
+            return False, None
+        frame = np.frombuffer(self._buffer, dtype=np.uint8).reshape(self.height, self.width, 3)
+        # Like cv2, fill ``image`` in place only if it already has the frame's shape
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
@@ -0,0 +1,150 @@
+import logging
+import multiprocessing as mp
+import queue
+import traceback
+import psutil
+
+
+def _child_main(init_fn, init_args, job_fn, shutdown_fn, tasks, results):
+    """Worker process body: warm up once, then run jobs until told to stop."""
+    try:
+        init_fn(*init_args)
+    except Exception:
+        results.put(("init_error", traceback.format_exc(), 0))
+        return
+    results.put(("ready", None, psutil.Process().memory_info().rss))
+    try:
+        while True:
+            job = tasks.get()
+            if job is None:
+                break
+            try:
+                status, payload = "ok", job_fn(*job)
+            except Exception:
+                status, payload = "error", traceback.format_exc()
+            results.put((status, payload, psutil.Process().memory_info().rss))
+    finally:
+        if shutdown_fn is not None:
+            shutdown_fn()
+
+
+class _WorkerHandle:
+    def __init__(self, ctx, init_fn, init_args, job_fn, shutdown_fn):
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.process = ctx.Process(
+            target=_child_main,
+            args=(init_fn, init_args, job_fn, shutdown_fn, self.tasks, self.results),
+            daemon=True,
+        )
+        self.process.start()
+        self.ready = False
+        self.jobs_done = 0
+        self.rss = 0
+
+    def receive(self, poll_interval=1.0):
+        """Wait for the next message, raising if the process dies first."""
+        while True:
+            try:
+                return self.results.get(timeout=poll_interval)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise RuntimeError(f"worker process exited with code {self.process.exitcode}")
+
+    def wait_ready(self):
+        if self.ready:
+            return
+        status, payload, rss = self.receive()
+        if status != "ready":
+            raise RuntimeError(f"worker failed to start:\n{payload}")
+        self.ready = True
+        self.rss = rss
+
+    def stop(self, timeout=60):
+        if self.process.is_alive():
+            self.tasks.put(None)
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class RecyclingWorker:
+    """Runs jobs one at a time in a child process that is replaced periodically.
+
+    The worker is retired after ``max_jobs`` jobs, or as soon as its RSS
+    passes ``max_rss_bytes``, which sheds whatever memory it has leaked. The
+    replacement is started while the outgoing worker runs its last job, so
+    ``init_fn`` (e.g. loading the model) has finished by the time it's
+    needed. State owned by the calling process is unaffected by recycling.
+
+    ``init_fn``, ``job_fn`` and ``shutdown_fn`` must be module-level
+    functions so they can be sent to a spawned process.
+    """
+    def __init__(self, init_fn, job_fn, init_args=(), shutdown_fn=None,
+                 max_jobs=10, max_rss_bytes=None, start_method="spawn"):
+        self._ctx = mp.get_context(start_method)
+        self._spec = (init_fn, init_args, job_fn, shutdown_fn)
+        self.max_jobs = max(1, max_jobs)
+        self.max_rss_bytes = max_rss_bytes
+        self.recycles = 0
+        self._current = None
+        self._standby = None
+
+    def _spawn(self):
+        return _WorkerHandle(self._ctx, *self._spec)
+
+    def _should_prewarm(self):
+        if self._current.jobs_done >= self.max_jobs - 1:
+            return True
+        # Start warming a replacement once memory is within 20% of the limit
+        return self.max_rss_bytes is not None and self._current.rss >= 0.8 * self.max_rss_bytes
+
+    def _over_memory(self):
+        return self.max_rss_bytes is not None and self._current.rss >= self.max_rss_bytes
+
+    def _recycle(self, reason):
+        print(f"♻️ Recycling worker ({reason}).")
+        logging.info(f"Recycling worker ({reason})")
+        old, self._current = self._current, None
+        old.stop()
+        self._current = self._standby
+        self._standby = None
+        self.recycles += 1
+
+    def run(self, *job):
+        """Run ``job_fn(*job)`` in the worker and return its result.
+
+        Raises RuntimeError if the job raised or the worker died; a dead
+        worker is replaced before the next job.
+        """
+        if self._current is None:
+            self._current = self._standby or self._spawn()
+            self._standby = None
+        try:
+            self._current.wait_ready()
+            self._current.tasks.put(job)
+            if self._should_prewarm() and self._standby is None:
+                self._standby = self._spawn()
+            status, payload, rss = self._current.receive()
+        except RuntimeError:
+            self._current.stop(timeout=5)
+            self._current = None
+            raise
+
+        self._current.jobs_done += 1
+        self._current.rss = rss
+        if self._current.jobs_done >= self.max_jobs:
+            self._recycle(f"{self._current.jobs_done} jobs")
+        elif self._over_memory():
+            self._recycle(f"RSS {rss / 1024**2:.0f} MB")
+
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def close(self):
+        for handle in (self._current, self._standby):
+            if handle is not None:
+                handle.stop()
+        self._current = self._standby = None
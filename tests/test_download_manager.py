@@ -0,0 +1,209 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from download_manager import DownloadManager
+
+
+def write_synthetic_mp4(path, frames=5):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30, (64, 36))
+    for i in range(frames):
+        writer.write(np.full((36, 64, 3), i * 40, np.uint8))
+    writer.release()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for condition")
+        time.sleep(0.01)
+
+
+class FakeDownload:
+    """Stands in for download_tracked: writes ``size`` bytes per video, optionally waiting on ``gate``."""
+    def __init__(self, size=10, gate=None, fail=()):
+        self.size = size
+        self.gate = gate
+        self.fail = set(fail)
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url, video_id, temp_dir):
+        with self._lock:
+            self.calls.append(video_id)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.gate is not None:
+                self.gate.wait(timeout=10)
+            if video_id in self.fail:
+                raise RuntimeError("simulated failure")
+            temp_dir.mkdir(parents=True, exist_ok=True)
+            path = temp_dir / f"{video_id}.mp4"
+            path.write_bytes(b"\0" * self.size)
+            return path
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def make_manager(tmp_path, download, count, **kwargs):
+    kwargs.setdefault("delay_range", None)
+    manager = DownloadManager(tmp_path / "temp", download, **kwargs)
+    for i in range(count):
+        manager.add(f"https://www.youtube.com/watch?v=vid{i}", f"vid{i}")
+    return manager
+
+
+def test_prefetch_limits_downloads_ahead_of_processing(tmp_path):
+    download = FakeDownload()
+    manager = make_manager(tmp_path, download, 5, prefetch=2, max_concurrent=2)
+    try:
+        wait_for(lambda: manager.depths()["ready"] == 2)
+        time.sleep(0.2)
+        assert len(download.calls) == 2
+
+        assert manager.next_ready()[1] == "vid0"
+        wait_for(lambda: len(download.calls) == 3)
+    finally:
+        manager.close()
+
+
+def test_concurrent_downloads_are_capped(tmp_path):
+    gate = threading.Event()
+    download = FakeDownload(gate=gate)
+    manager = make_manager(tmp_path, download, 4, prefetch=4, max_concurrent=2)
+    try:
+        wait_for(lambda: download.active == 2)
+        time.sleep(0.2)
+        assert len(download.calls) == 2
+
+        gate.set()
+        ready = [manager.next_ready() for _ in range(4)]
+        assert sorted(video_id for _, video_id, _ in ready) == ["vid0", "vid1", "vid2", "vid3"]
+        assert download.max_active == 2
+        assert manager.next_ready() is None
+    finally:
+        manager.close()
+
+
+def test_disk_budget_holds_back_new_downloads(tmp_path):
+    download = FakeDownload(size=150)
+    manager = make_manager(tmp_path, download, 3, prefetch=3, max_concurrent=1, disk_budget_bytes=100)
+    try:
+        wait_for(lambda: manager.depths()["ready"] == 1)
+        time.sleep(0.2)
+        # The first download always runs; the next waits until temp/ is back under budget
+        assert download.calls == ["vid0"]
+
+        _, _, path = manager.next_ready()
+        path.unlink()
+        wait_for(lambda: len(download.calls) == 2)
+    finally:
+        manager.close()
+
+
+def test_failed_download_is_reported_without_a_path(tmp_path):
+    download = FakeDownload(fail={"vid0"})
+    manager = make_manager(tmp_path, download, 2, prefetch=2, max_concurrent=1)
+    try:
+        assert manager.next_ready() == ("https://www.youtube.com/watch?v=vid0", "vid0", None)
+        _, video_id, path = manager.next_ready()
+        assert video_id == "vid1" and path.exists()
+    finally:
+        manager.close()
+
+
+def test_close_drops_pending_and_deletes_in_flight_files(tmp_path):
+    gate = threading.Event()
+    download = FakeDownload(gate=gate)
+    manager = make_manager(tmp_path, download, 3, prefetch=3, max_concurrent=1)
+    wait_for(lambda: download.active == 1)
+
+    manager.close()
+    assert manager.depths()["pending"] == 0
+    gate.set()
+    wait_for(lambda: download.active == 0)
+    wait_for(lambda: not (tmp_path / "temp" / "vid0.mp4").exists())
+
+    assert manager.next_ready() is None
+    assert download.calls == ["vid0"]
+
+
+# --- download_video_clip ---
+class FakeYoutubeDL:
+    """Stands in for yt_dlp.YoutubeDL: writes a synthetic mp4 at the output template, failing the first ``failures`` calls."""
+    failures = 0
+    attempts = 0
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=True):
+        FakeYoutubeDL.attempts += 1
+        if FakeYoutubeDL.attempts <= FakeYoutubeDL.failures:
+            raise RuntimeError("HTTP Error 429: Too Many Requests")
+        result = {"id": url.rsplit("=", 1)[-1], "ext": "mp4"}
+        write_synthetic_mp4(self.prepare_filename(result))
+        return result
+
+    def prepare_filename(self, result):
+        return self.opts["outtmpl"] % {"ext": result["ext"]}
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    for name in ("torch", "yt_dlp", "ddgs"):
+        pytest.importorskip(name)
+    import scraper
+    FakeYoutubeDL.failures = FakeYoutubeDL.attempts = 0
+    monkeypatch.setattr(scraper, "YoutubeDL", FakeYoutubeDL)
+    return scraper
+
+
+@pytest.fixture
+def sleeps(scraper, monkeypatch):
+    """The retry waits download_video_clip asked for, without waiting."""
+    calls = []
+    monkeypatch.setattr(scraper.time, "sleep", calls.append)
+    return calls
+
+
+def test_download_video_clip_writes_an_mp4(scraper, sleeps, tmp_path):
+    path = scraper.download_video_clip("https://www.youtube.com/watch?v=abc", "abc", tmp_path / "temp")
+
+    assert path == tmp_path / "temp" / "abc.mp4"
+    assert cv2.VideoCapture(str(path)).read()[0]
+    assert FakeYoutubeDL.attempts == 1 and sleeps == []
+
+
+def test_download_video_clip_retries(scraper, sleeps, tmp_path):
+    FakeYoutubeDL.failures = 2
+    path = scraper.download_video_clip("https://www.youtube.com/watch?v=abc", "abc", tmp_path / "temp")
+
+    assert path is not None and path.exists()
+    assert FakeYoutubeDL.attempts == 3 and len(sleeps) == 2
+
+
+def test_download_video_clip_gives_up_after_three_attempts(scraper, sleeps, tmp_path):
+    FakeYoutubeDL.failures = 5
+    path = scraper.download_video_clip("https://www.youtube.com/watch?v=abc", "abc", tmp_path / "temp")
+
+    assert path is None
+    assert FakeYoutubeDL.attempts == 3
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import query_scheduler
+from query_scheduler import QueryScheduler
+
+
+class FakeSearch:
+    """Stands in for DDGS: returns canned URLs per query and counts calls."""
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def __call__(self, query, max_results):
+        self.calls.append(query)
+        return self.results.get(query, [])[:max_results]
+
+
+def make_scheduler(tmp_path, queries, results, seen=(), **kwargs):
+    queries_file = tmp_path / "search_terms.txt"
+    queries_file.write_text("\n".join(queries) + "\n")
+    search = FakeSearch(results)
+    seen = set(seen)
+    scheduler = QueryScheduler(queries_file, tmp_path / "state.db", search,
+                               is_seen=seen.__contains__, **kwargs)
+    return scheduler, search, seen
+
+
+def test_search_is_cached_until_ttl_expires(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_scheduler.time, "time", lambda: now[0])
+    scheduler, search, _ = make_scheduler(tmp_path, ["a"], {"a": ["u1", "u2"]}, cache_ttl=60)
+
+    assert scheduler.search("a") == ["u1", "u2"]
+    now[0] += 59
+    assert scheduler.search("a") == ["u1", "u2"]
+    assert search.calls == ["a"]
+
+    now[0] += 2
+    scheduler.search("a")
+    assert search.calls == ["a", "a"]
+
+
+def test_exhausted_query_is_skipped(tmp_path):
+    scheduler, _, seen = make_scheduler(tmp_path, ["a", "b"], {"a": ["u1", "u2"], "b": ["u3"]})
+    scheduler.search("a")
+    scheduler.search("b")
+    seen.update(["u1", "u2"])
+
+    assert {scheduler.next_query() for _ in range(20)} == {"b"}
+
+    # With everything exhausted, fall back to the full list rather than stalling
+    seen.add("u3")
+    assert scheduler.next_query() in {"a", "b"}
+
+
+def test_untried_queries_first_then_best_yield(tmp_path):
+    scheduler, _, _ = make_scheduler(tmp_path, ["a", "b", "c"], {}, exploration=0.0)
+    # Yields are normalized by the best so far, so record the better query first
+    scheduler.record_yield("b", new_urls=2, frames_saved=20)
+    scheduler.record_yield("a", new_urls=0, frames_saved=1)
+
+    assert scheduler.next_query() == "c"
+
+    scheduler.record_yield("c", new_urls=0, frames_saved=0)
+    assert scheduler.next_query() == "b"
@@ -1,11 +1,17 @@
 import os
+import sys
 import cv2
 import shutil
 from pathlib import Path
 from tqdm import tqdm
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+from frame_store import FrameManifest, migrate_frames
+from frame_codec import FrameEncoder, read_frame
+
 RAW_DIR = Path("data/raw")
 PROCESSED_DIR = Path("data/processed")
+STATE_DB = Path("config/scraper_state.db")
 TEMP_DIR = Path(r"C:\Users\Zanea\Downloads\image_temp")
 
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
@@ -23,36 +29,43 @@ def is_grayscale(image):
     return False
 
 def convert_images():
-    images = list(RAW_DIR.glob("*.jpg")) + list(RAW_DIR.glob("*.png")) + list(RAW_DIR.glob("*.jpeg"))
+    manifest = FrameManifest(RAW_DIR)
+    migrate_frames(RAW_DIR, PROCESSED_DIR, STATE_DB, manifest)
+    records = manifest.records()
 
-    print(f"Found {len(images)} images in raw folder.")
+    print(f"Found {len(records)} images in raw folder.")
 
-    # Process images and save to SSD temp folder only
-    for img_path in tqdm(images, desc="Converting to grayscale"):
-        temp_save_path = TEMP_DIR / img_path.name
-        final_save_path = PROCESSED_DIR / img_path.name
+    # Process images and save to SSD temp folder only, in the same shard folders as raw
+    for record in tqdm(records, desc="Converting to grayscale"):
+        img_path = RAW_DIR / record.path
+        temp_save_path = TEMP_DIR / record.path
+        final_save_path = PROCESSED_DIR / record.path
 
         # Skip if already processed (check final HDD folder)
         if final_save_path.exists():
             continue
 
-        img = cv2.imread(str(img_path))
+        img = read_frame(img_path)
         if img is None:
             print(f"⚠️ Skipping unreadable file: {img_path.name}")
             continue
 
+        # Re-encode in the frame's own format so processed paths keep mirroring raw
+        encoder = FrameEncoder.for_path(img_path, record.format)
+        temp_save_path.parent.mkdir(parents=True, exist_ok=True)
         if is_grayscale(img):
-            cv2.imwrite(str(temp_save_path), img)
+            encoder.write(temp_save_path, img)
         else:
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            cv2.imwrite(str(temp_save_path), gray)
+            encoder.write(temp_save_path, gray)
 
     print("✅ Conversion done, now moving files to processed folder...")
 
     # Batch move all processed images from SSD temp to HDD processed folder
-    for temp_img_path in tqdm(list(TEMP_DIR.glob("*")), desc="Moving to processed folder"):
-        final_path = PROCESSED_DIR / temp_img_path.name
+    for temp_img_path in tqdm([p for p in TEMP_DIR.rglob("*") if p.is_file()], desc="Moving to processed folder"):
+        final_path = PROCESSED_DIR / temp_img_path.relative_to(TEMP_DIR)
         if not final_path.exists():
+            final_path.parent.mkdir(parents=True, exist_ok=True)
             shutil.move(str(temp_img_path), str(final_path))
 
     print("✅ All images moved to processed folder!")
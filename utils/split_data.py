@@ -1,12 +1,18 @@
 import os
+import sys
 import random
 import shutil
 from pathlib import Path
 from collections import defaultdict
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+from frame_store import FrameManifest, migrate_frames
+
 # Configuration
+RAW_DIR = Path("data/raw")
 PROCESSED_DIR = Path("data/processed")
 LABELS_FLAT_DIR = Path("data/labels")
+STATE_DB = Path("config/scraper_state.db")
 SPLIT_DIR = Path("data/split")
 SPLIT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -42,7 +48,10 @@ def create_split_folders():
 def main():
     create_split_folders()
 
-    images = sorted([p for p in PROCESSED_DIR.glob("*") if p.suffix.lower() in [".jpg", ".jpeg", ".png"]])
+    manifest = FrameManifest(RAW_DIR)
+    migrate_frames(RAW_DIR, PROCESSED_DIR, STATE_DB, manifest)
+    # Processed frames mirror data/raw, so the raw manifest lists them too
+    images = [p for p in manifest.paths(PROCESSED_DIR) if p.exists()]
     paired_images = []
 
     for img_path in images: